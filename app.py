@@ -1,7 +1,15 @@
 # -*- coding: utf-8 -*-
 
 from dash import Dash
-from flask import Flask, redirect
+from flask import Flask, Response, abort, jsonify, redirect
+from flask_compress import Compress
+
+from modules.environment import IS_TO_USE_METRICS, IS_TO_USE_PROFILING, IS_TO_USE_WARMUP
+from modules.metrics import get_metrics_text, record_response_size
+from modules.profiling import get_profile, get_profiles, get_slowest_requests, release_profiler, \
+                              start_profiling, stop_profiling
+from modules.rawjson import insert_raw_json
+from modules.warmup import get_warmup_progress
 
 
 url_base_pathname = '/catalog-dash'
@@ -20,6 +28,71 @@ def index():
     return redirect('{}'.format(url_base_pathname))
 
 
+if IS_TO_USE_METRICS:
+    @server.route('/metrics')
+    def metrics():
+        # the metrics of this process in the text format of Prometheus
+        return Response(get_metrics_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+if IS_TO_USE_WARMUP:
+    @server.route('/warmup')
+    def warmup():
+        # the progress of the last warm-up of each app in this process (see `modules/warmup.py`)
+        return jsonify(get_warmup_progress())
+
+
+if IS_TO_USE_PROFILING:
+    # the callback requests are timed and the ones that ask for it are profiled (see `modules/profiling.py`)
+    server.before_request(start_profiling)
+    server.after_request(stop_profiling)
+    server.teardown_request(release_profiler)
+
+    # content type of each kind of profile
+    profile_content_types = {
+        'pstats': 'application/octet-stream',
+        'text': 'text/plain; charset=utf-8',
+        'collapsed': 'text/plain; charset=utf-8'
+    }
+
+    @server.route('/profiles')
+    def profiles():
+        # the profiled requests of this process, the most recent ones first
+        return jsonify(get_profiles())
+
+    @server.route('/profiles/slowest')
+    def slowest_requests():
+        # the slowest requests of this process with their inputs, the slowest ones first
+        return jsonify(get_slowest_requests())
+
+    @server.route('/profiles/<int:profile_id>.<kind>')
+    def profile(profile_id, kind):
+        # e.g. `/profiles/1.pstats` (it can be read by `pstats` or snakeviz), `/profiles/1.text`
+        # or `/profiles/1.collapsed` (i.e. the input of flame graph tools)
+        content = get_profile(profile_id, kind) if kind in profile_content_types else None
+
+        if content is None:
+            abort(404)
+
+        response = Response(content, content_type=profile_content_types[kind])
+
+        if kind == 'pstats':
+            response.headers['Content-Disposition'] = 'attachment; filename=profile-{}.pstats'.format(profile_id)
+
+        return response
+
+
+# Flask runs the `after_request` functions in the reverse order of their registration, then the response
+# of a callback is completed by `insert_raw_json` (i.e. the cached figures are inserted in it), it is compressed
+# by `Compress`, `record_response_size` records the size that is sent and just then the functions registered above
+# see it; then Dash does not register its own `Compress` and these functions must be registered in this order
+if IS_TO_USE_METRICS:
+    server.after_request(record_response_size)
+
+Compress(server)
+server.after_request(insert_raw_json)
+
+
 @server.route('/<bad_link>')
 def redirect_to_index(bad_link):
     # if the user types an invalid link, then it redirects him to `url_base_pathname`
@@ -32,5 +105,7 @@ app = Dash(
     external_stylesheets=external_stylesheets,
     external_scripts=external_scripts,
     suppress_callback_exceptions=True,
-    url_base_pathname='{}/'.format(url_base_pathname)
+    url_base_pathname='{}/'.format(url_base_pathname),
+    # the responses are compressed by the `Compress` above, after `insert_raw_json`
+    compress=False
 )
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 
 # normal apps
-from apps.download import layout as layout_download
+from apps.download import get_layout as get_layout_download
 from apps.index import layout as layout_index
-from apps.scene import layout as layout_scene
+from apps.scene import get_layout as get_layout_scene
 
 # error apps
 from apps.error import layout_error_404
@@ -1,64 +1,84 @@
 # -*- coding: utf-8 -*-
 
 from datetime import datetime as dt
-from json import loads
+from json import dumps, loads
 
-from dash.dependencies import Input, Output
+from dash import callback_context
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 from dash.development.base_component import Component
 from dash_leaflet.express import dicts_to_geojson
 
 from app import app
+from modules.environment import TIME_SERIES_MAX_POINTS
 from modules.logging import logging
+from modules.metrics import instrument_callback
+from modules.table import get_page_of_df
 
 from apps.download.layout import *
-from apps.download.service import __convert_dates_from_str_to_date, \
-                                  __create_sub_df_based_on_parameters, \
-                                  __get_geojson_data, color_prop, get_minmax_from_df
-from apps.service import __get_date_picker_range_message, \
-                         __get_figure_of_number_of_downloaded_scenes_time_series
-
-
-minmax = get_minmax_from_df(df_d_base)
+from apps.download.service import __convert_dates_from_str_to_date, __get_xaxis_range_from_relayout_data, \
+                                  __get_map_data, color_prop, get_map_data_based_on_parameters, \
+                                  get_sub_dfs_based_on_parameters, get_time_series_figure_based_on_parameters, \
+                                  request_sequencer, table_formatters
+from apps.service import __get_date_picker_range_message
 
 
 @app.callback(
     Output('download--output-container-date-picker-range', 'children'),
     [Input('download--date-picker-range', 'start_date'),
     Input('download--date-picker-range', 'end_date')])
+@instrument_callback
 def download__update_output_container_date_picker_range(start_date, end_date):
     return __get_date_picker_range_message(start_date, end_date)
 
 
-@app.callback(
-    [Output('download--table--number-of-downloaded-scenes-by-date', 'data'),
-    Output('download--table--number-of-downloaded-scenes-by-user-and-date', 'data')],
-    [Input('download--date-picker-range', 'start_date'),
-    Input('download--date-picker-range', 'end_date'),
-    Input('download--input--limit', 'value')])
-def download__update_tables_by_parameters(start_date, end_date, limit):
-    logging.info('download__update_tables_by_parameters()')
-
-    logging.info('download__update_tables_by_parameters() - start_date: %s', start_date)
-    logging.info('download__update_tables_by_parameters() - end_date: %s', end_date)
-    logging.info('download__update_tables_by_parameters() - limit: %s', limit)
-
+def __get_sub_df_of_table(start_date, end_date, limit, sub_df_name, token):
     start_date, end_date = __convert_dates_from_str_to_date(start_date, end_date)
 
-    # if start date is greater than end date or limit is None, then the callback returns an empty object
+    # if start date is greater than end date or limit is None, then the table is empty
     if start_date > end_date or limit is None:
-        return [], []
+        return None
 
-    # filter base dataframe based on start date, end date and limit
-    sub_df_d_base = __create_sub_df_based_on_parameters(
-        df_d_base, start_date, end_date, limit
-    )
+    # the sub sets are not created for a request that is already superseded (e.g. the user types a limit)
+    sub_df = get_sub_dfs_based_on_parameters(download_store, start_date, end_date, limit, token)[sub_df_name]
 
-    # filter the previous dataframe to get the number of downloaded scenes by user and date
-    sub_df_ndsb_user_date = sub_df_d_base.groupby(['user_id', 'name', 'date'])['number'].sum().to_frame('number').reset_index()
-    sub_df_ndsb_user_date = sub_df_ndsb_user_date.sort_values(['number'], ascending=False)
+    # if the user has already changed the parameters, then the page is not built
+    request_sequencer.check(token)
 
-    # filter the previous dataframe to get the number of downloaded scenes by date only
-    sub_df_ndsb_date = sub_df_ndsb_user_date.groupby(['date'])['number'].sum().to_frame('number').reset_index()
+    return sub_df
+
+
+@app.callback(
+    [Output('download--table--number-of-downloaded-scenes-by-date', 'data'),
+    Output('download--table--number-of-downloaded-scenes-by-date', 'page_count')],
+    [Input('download--date-picker-range', 'start_date'),
+    Input('download--date-picker-range', 'end_date'),
+    Input('download--input--limit', 'value'),
+    Input('download--table--number-of-downloaded-scenes-by-date', 'page_current'),
+    Input('download--table--number-of-downloaded-scenes-by-date', 'page_size'),
+    Input('download--table--number-of-downloaded-scenes-by-date', 'sort_by'),
+    Input('download--table--number-of-downloaded-scenes-by-date', 'filter_query')],
+    [State('download--store--session-id', 'data')])
+@instrument_callback
+def download__update_table_by_date(start_date, end_date, limit, page_current, page_size, sort_by, filter_query,
+                                   session_id):
+    logging.info('download__update_table_by_date()')
+
+    logging.info('download__update_table_by_date() - start_date: %s', start_date)
+    logging.info('download__update_table_by_date() - end_date: %s', end_date)
+    logging.info('download__update_table_by_date() - limit: %s', limit)
+    logging.info('download__update_table_by_date() - page_current: %s', page_current)
+    logging.info('download__update_table_by_date() - sort_by: %s', sort_by)
+    logging.info('download__update_table_by_date() - filter_query: %s', filter_query)
+
+    token = request_sequencer.start(session_id, 'download__update_table_by_date')
+
+    sub_df_ndsb_date = __get_sub_df_of_table(start_date, end_date, limit, 'sub_df_ndsb_date', token)
+
+    if sub_df_ndsb_date is None:
+        return [], 1
+
+    # the dates with more downloads are shown first, if the user does not sort the table
     sub_df_ndsb_date = sub_df_ndsb_date.sort_values(['number'], ascending=False)
 
     # I get the last column and I add it to the beginning
@@ -66,21 +86,69 @@ def download__update_tables_by_parameters(start_date, end_date, limit):
     columns_df_ndsb_date = columns_df_ndsb_date[-1:] + columns_df_ndsb_date[:-1]
     sub_df_ndsb_date = sub_df_ndsb_date[columns_df_ndsb_date]
 
-    return sub_df_ndsb_date.to_dict('records'), \
-           sub_df_ndsb_user_date.to_dict('records')
+    return get_page_of_df(sub_df_ndsb_date, page_current, page_size, sort_by, filter_query, table_formatters)
+
+
+@app.callback(
+    [Output('download--table--number-of-downloaded-scenes-by-user-and-date', 'data'),
+    Output('download--table--number-of-downloaded-scenes-by-user-and-date', 'page_count')],
+    [Input('download--date-picker-range', 'start_date'),
+    Input('download--date-picker-range', 'end_date'),
+    Input('download--input--limit', 'value'),
+    Input('download--table--number-of-downloaded-scenes-by-user-and-date', 'page_current'),
+    Input('download--table--number-of-downloaded-scenes-by-user-and-date', 'page_size'),
+    Input('download--table--number-of-downloaded-scenes-by-user-and-date', 'sort_by'),
+    Input('download--table--number-of-downloaded-scenes-by-user-and-date', 'filter_query')],
+    [State('download--store--session-id', 'data')])
+@instrument_callback
+def download__update_table_by_user_and_date(start_date, end_date, limit, page_current, page_size, sort_by, filter_query,
+                                            session_id):
+    logging.info('download__update_table_by_user_and_date()')
+
+    logging.info('download__update_table_by_user_and_date() - start_date: %s', start_date)
+    logging.info('download__update_table_by_user_and_date() - end_date: %s', end_date)
+    logging.info('download__update_table_by_user_and_date() - limit: %s', limit)
+    logging.info('download__update_table_by_user_and_date() - page_current: %s', page_current)
+    logging.info('download__update_table_by_user_and_date() - sort_by: %s', sort_by)
+    logging.info('download__update_table_by_user_and_date() - filter_query: %s', filter_query)
+
+    token = request_sequencer.start(session_id, 'download__update_table_by_user_and_date')
+
+    sub_df_ndsb_user_date = __get_sub_df_of_table(start_date, end_date, limit, 'sub_df_ndsb_user_date', token)
+
+    if sub_df_ndsb_user_date is None:
+        return [], 1
+
+    return get_page_of_df(sub_df_ndsb_user_date, page_current, page_size, sort_by, filter_query, table_formatters)
 
 
 @app.callback(
     Output('download--graph--graph--time-series--number-of-downloaded-scenes-by-date', 'figure'),
     [Input('download--date-picker-range', 'start_date'),
     Input('download--date-picker-range', 'end_date'),
-    Input('download--input--limit', 'value')])
-def download__update_chart_by_parameters(start_date, end_date, limit):
+    Input('download--input--limit', 'value'),
+    Input('download--graph--graph--time-series--number-of-downloaded-scenes-by-date', 'relayoutData')],
+    [State('download--store--session-id', 'data')])
+@instrument_callback
+def download__update_chart_by_parameters(start_date, end_date, limit, relayout_data, session_id):
     logging.info('download__update_chart_by_parameters()')
 
     logging.info('download__update_chart_by_parameters() - start_date: %s', start_date)
     logging.info('download__update_chart_by_parameters() - end_date: %s', end_date)
     logging.info('download__update_chart_by_parameters() - limit: %s', limit)
+    logging.info('download__update_chart_by_parameters() - relayout_data: %s', relayout_data)
+
+    # the range that the user has zoomed in is used just if the chart has triggered the callback,
+    # because a new date range shows the whole chart again
+    xaxis_range = None
+
+    if callback_context.triggered[0]['prop_id'].endswith('.relayoutData'):
+        xaxis_range = __get_xaxis_range_from_relayout_data(relayout_data)
+
+        # if the points are not downsampled or the x axis has not changed (e.g. the chart was resized),
+        # then the chart keeps its points
+        if TIME_SERIES_MAX_POINTS <= 0 or (xaxis_range is None and not relayout_data.get('xaxis.autorange')):
+            raise PreventUpdate
 
     start_date, end_date = __convert_dates_from_str_to_date(start_date, end_date)
 
@@ -88,44 +156,56 @@ def download__update_chart_by_parameters(start_date, end_date, limit):
     if start_date > end_date or limit is None:
         return {"data": [], "layout": {}, "frames": []}
 
-    sub_df = __create_sub_df_based_on_parameters(
-        df_d_base, start_date, end_date, limit
-    )
-
-    # filter the previous dataframe to get the number of downloaded scenes by date only
-    sub_df = sub_df.groupby(['date'])['number'].sum().to_frame('number').reset_index()
-    sub_df = sub_df.sort_values(['date'], ascending=True)
+    token = request_sequencer.start(session_id, 'download__update_chart_by_parameters')
 
-    return __get_figure_of_number_of_downloaded_scenes_time_series(
-        sub_df,
-        title='Time Series: Number of Download Scenes by Date'
+    return get_time_series_figure_based_on_parameters(
+        download_store, start_date, end_date, limit, xaxis_range=xaxis_range, token=token
     )
 
 
 @app.callback(
-    Output('download--map--number-of-downloaded-scenes-by-location', 'data'),
+    [Output('download--map--number-of-downloaded-scenes-by-location', 'data'),
+    Output('download--map--number-of-downloaded-scenes-by-location', 'format')],
     [Input('download--date-picker-range', 'start_date'),
     Input('download--date-picker-range', 'end_date'),
-    Input('download--input--limit', 'value')])
-def download__update_map_by_parameters(start_date, end_date, limit):
+    Input('download--input--limit', 'value'),
+    Input('download--map', 'center'),
+    Input('download--map', 'zoom')],
+    [State('download--store--session-id', 'data')])
+@instrument_callback
+def download__update_map_by_parameters(start_date, end_date, limit, center, zoom, session_id):
     logging.info('download__update_map_by_parameters()')
 
     logging.info('download__update_map_by_parameters() - start_date: %s', start_date)
     logging.info('download__update_map_by_parameters() - end_date: %s', end_date)
     logging.info('download__update_map_by_parameters() - limit: %s', limit)
+    logging.info('download__update_map_by_parameters() - center: %s', center)
+    logging.info('download__update_map_by_parameters() - zoom: %s', zoom)
 
     start_date, end_date = __convert_dates_from_str_to_date(start_date, end_date)
 
     # if start date is greater than end date or limit is None, then the callback returns an empty object
     if start_date > end_date or limit is None:
-        return dicts_to_geojson([])
+        return __get_map_data(dumps(dicts_to_geojson([])))
 
-    sub_df = __create_sub_df_based_on_parameters(
-        df_d_base, start_date, end_date, limit
-    )
+    token = request_sequencer.start(session_id, 'download__update_map_by_parameters')
+
+    # the markers and the clusters in the view of the map, the default view is already cached by the warm-up
+    return get_map_data_based_on_parameters(download_store, start_date, end_date, limit, center, zoom, token=token)
+
+
+@app.callback(
+    Output('download--map', 'viewport'),
+    [Input('download--map--number-of-downloaded-scenes-by-location', 'click_feature')])
+@instrument_callback
+def download__zoom_in_on_cluster(feature):
+    # if a point (i.e. not a cluster) is clicked, then the map does not change
+    if feature is None or not feature.get('properties', {}).get('cluster'):
+        raise PreventUpdate
+
+    longitude, latitude = feature['geometry']['coordinates']
 
-    # build the geojson object with a list of markers
-    return __get_geojson_data(sub_df)
+    return {'center': [latitude, longitude], 'zoom': feature['properties']['expansion_zoom']}
 
 
 @app.callback(
@@ -134,8 +214,10 @@ def download__update_map_by_parameters(start_date, end_date, limit):
     Output("download--map--colorbar", "min"),
     Output("download--map--colorbar", "max")],
     [Input("download--map--dropdown--color-scale", "value")])
+@instrument_callback
 def download__update_map_colorbar(csc):
     csc = loads(csc)
+    minmax = download_store.data['minmax']
     hideout = {
         'colorscale': csc,
         'color_prop': color_prop,
@@ -2,318 +2,293 @@
 
 from json import dumps
 from datetime import timedelta
+from uuid import uuid4
 
-from dash_core_components import DatePickerRange, Dropdown, Graph, Input as dcc_Input, Loading
+from dash_core_components import DatePickerRange, Dropdown, Graph, Input as dcc_Input, Loading, Store
 from dash_html_components import Div, H1, H3, P
 from dash_table import DataTable
 from dash_leaflet import Colorbar, GeoJSON, Map, TileLayer
-from dash_leaflet.express import scatter
-from numpy import log as np_log
-from pandas import DataFrame, to_datetime
 
-from apps.download.service import default_csc, color_prop, csc_map, csc_options, get_minmax_from_df
-from apps.service import filter_df_by, get_table_styles
-from modules.logging import logging
-from modules.model import DatabaseConnection
+from apps.download.service import default_csc, default_limit, default_map_center, default_map_zoom, color_prop, \
+                                  csc_map, csc_options, get_default_date_range, get_download_data, \
+                                  get_warmup_tasks, map_data_cache, map_point_to_layer, \
+                                  read_download_data_from_snapshot, refresh_download_data, sub_dfs_cache, \
+                                  write_download_snapshot
+from apps.service import get_table_styles
+from modules.refresh import register_follower, register_refresher
+from modules.store import DataStore
+from modules.warmup import register_warmup
 from modules.utils import colors
 
 
-##################################################
-# get the dataframes from database
-##################################################
-# database connection
-db = DatabaseConnection()
+# the store keeps the dataframes and it receives a new version of them on each refresh
+download_store = DataStore('download')
+# each new version of the data is saved on disk to be used on the next start
+download_store.add_listener(write_download_snapshot)
+# the filtered results of the old data are not used anymore
+download_store.add_listener(sub_dfs_cache.clear)
+download_store.add_listener(map_data_cache.clear)
+download_store.publish(get_download_data())
 
-# get the dash download nofbs dataframe (df_dd_nofbs) from the database
-# nofbs - number of downloaded assets by scene
-df_dd_nofbs = db.select_from_dash_download_nofbs()
+register_refresher('download', download_store, refresh_download_data)
+# if the data is shared by the processes, then the ones that do not refresh it attach to the new snapshots
+register_follower('download', download_store, read_download_data_from_snapshot)
+# the results of the page when it is opened are computed in background for each version of the data
+register_warmup('download', download_store, get_warmup_tasks)
 
 
-##################################################
-# fix the dataframes
-##################################################
+def get_layout():
+    # the layout is built on each page load in order to show the last version of the data
+    data = download_store.data
 
-# convert `str` to a `datetime`, and `datetime` to 'date' type
-# df_dd_nofbs['date'] = to_datetime(df_dd_nofbs['date']).dt.date
+    df_information = data['df_information']
+    min_start_date = data['min_start_date']
+    max_end_date = data['max_end_date']
+    minmax = data['minmax']
 
-logging.info(
-    "download.layout - df_dd_nofbs.head(): \n"
-    f"{df_dd_nofbs[['scene_id', 'nofbs', 'user_id', 'date', 'longitude', 'latitude']].head()}\n"
-)
-# logging.debug(
-#     f"download.layout - df_dd_nofbs.dtypes: \n{df_dd_nofbs.dtypes}\n"
-# )
+    start_date, end_date = get_default_date_range(data)
 
-##################################################
-# get values from dataframe
-##################################################
+    return Div([
+        # identifier of this page (i.e. the session), the callbacks abandon its old requests when there is a new one
+        Store(id='download--store--session-id', data=uuid4().hex),
+        # title
+        H1(
+            children='catalog-dash',
+            style={
+                'textAlign': 'center',
+                'color': colors['text']
+            }
+        ),
+        # subtitle
+        H3(
+            children='Download table analysis',
+            style={
+                'textAlign': 'center',
+                'color': colors['text']
+            }
+        ),
 
-# get the minimum and maximum dates, and the number of downloaded assets
-min_start_date = df_dd_nofbs['date'].min()
-max_end_date = df_dd_nofbs['date'].max()
-number_of_downloaded_assets = df_dd_nofbs['nofbs'].sum()
-
-logging.info(f'download.layout - min_start_date: {min_start_date}')
-logging.info(f'download.layout - max_end_date: {max_end_date}')
-logging.info(f'download.layout - number_of_downloaded_assets: {number_of_downloaded_assets}')
-
-
-# create the information dataframe
-data = [
-    ['Number of downloaded scenes', len(df_dd_nofbs)],
-    ['Number of downloaded assets', number_of_downloaded_assets],
-    ['Minimum date', min_start_date],
-    ['Maximum date', max_end_date]
-]
-df_information = DataFrame(data, columns=['information', 'value'])
-
-logging.info(f'download.layout - df_information.head(): \n{df_information.head()}\n')
-
-
-# df_d_base - number of downloaded scenes by user, date and long/lat
-# this df contains all columns I need to build the tables and charts
-df_d_base = filter_df_by(
-    df_dd_nofbs,
-    group_by=['user_id', 'name', 'date', 'longitude', 'latitude'],
-    sort_by=['number'],
-    ascending=False
-)
-
-logging.info(f'download.layout - df_d_base.head(): \n{df_d_base.head()}\n')
-
-
-minmax = get_minmax_from_df(df_d_base)
-
-
-layout = Div([
-    # title
-    H1(
-        children='catalog-dash',
-        style={
-            'textAlign': 'center',
-            'color': colors['text']
-        }
-    ),
-    # subtitle
-    H3(
-        children='Download table analysis',
-        style={
-            'textAlign': 'center',
-            'color': colors['text']
-        }
-    ),
-
-    # information table
-    Div([
-        # table information, date picker range and limit
+        # information table
         Div([
-            # table information
+            # table information, date picker range and limit
             Div([
-                # title
-                P(
-                    children='Table: Information',
-                    style={
-                        'textAlign': 'center',
-                        'color': colors['text']
-                    }
-                ),
                 # table information
-                DataTable(
-                    id='table--information',
-                    columns=[{"name": i, "id": i} for i in df_information.columns],
-                    data=df_information.to_dict('records'),
-                    fixed_rows={'headers': True, 'data': 0},
-                    **get_table_styles()
-                ),
-            ], style={'max-width': '400px'}),
-            # date picker range
-            Div([
-                # Select the start and end date to filter the tables and charts
-                P(
-                    children='Select the start and end date to filter the tables and charts:',
-                    style={
-                        'textAlign': 'center',
-                        'color': colors['text'],
-                        'margin-top': '20px'
-                    }
-                ),
+                Div([
+                    # title
+                    P(
+                        children='Table: Information',
+                        style={
+                            'textAlign': 'center',
+                            'color': colors['text']
+                        }
+                    ),
+                    # table information
+                    DataTable(
+                        id='table--information',
+                        columns=[{"name": i, "id": i} for i in df_information.columns],
+                        data=df_information.to_dict('records'),
+                        fixed_rows={'headers': True, 'data': 0},
+                        **get_table_styles()
+                    ),
+                ], style={'max-width': '400px'}),
                 # date picker range
                 Div([
-                    DatePickerRange(
-                        id='download--date-picker-range',
-                        display_format='DD/MM/YYYY',
-                        min_date_allowed=min_start_date,
-                        max_date_allowed=max_end_date + timedelta(days=1),
-                        start_date=min_start_date,
-                        end_date=min_start_date + timedelta(days=7)
-                    )
-                ], style={
-                    'width': '100%', 'display': 'flex', 'align-items': 'center', 'justify-content': 'center',
-                    'padding-right': '10px'
-                }),
-                # date picker range output
+                    # Select the start and end date to filter the tables and charts
+                    P(
+                        children='Select the start and end date to filter the tables and charts:',
+                        style={
+                            'textAlign': 'center',
+                            'color': colors['text'],
+                            'margin-top': '20px'
+                        }
+                    ),
+                    # date picker range
+                    Div([
+                        DatePickerRange(
+                            id='download--date-picker-range',
+                            display_format='DD/MM/YYYY',
+                            min_date_allowed=min_start_date,
+                            max_date_allowed=max_end_date + timedelta(days=1),
+                            start_date=start_date,
+                            end_date=end_date,
+                            # the callbacks are fired when both dates have been selected, instead of each one
+                            updatemode='bothdates'
+                        )
+                    ], style={
+                        'width': '100%', 'display': 'flex', 'align-items': 'center', 'justify-content': 'center',
+                        'padding-right': '10px'
+                    }),
+                    # date picker range output
+                    Div([
+                        P(
+                            id='download--output-container-date-picker-range',
+                            style={
+                                'textAlign': 'center',
+                                'color': colors['text'],
+                                'margin-top': '5px'
+                            }
+                        ),
+                    ], style={'width': '100%', 'display': 'flex', 'align-items': 'center', 'justify-content': 'center'}),
+                ], style={'padding': '10px'}),
+                # limit
                 Div([
+                    # limit
                     P(
-                        id='download--output-container-date-picker-range',
+                        children='Limit (0 shows all):',
                         style={
                             'textAlign': 'center',
                             'color': colors['text'],
-                            'margin-top': '5px'
+                            'margin-top': '20px'
                         }
                     ),
-                ], style={'width': '100%', 'display': 'flex', 'align-items': 'center', 'justify-content': 'center'}),
-            ], style={'padding': '10px'}),
-            # limit
+                    # date picker range
+                    dcc_Input(
+                        id="download--input--limit",
+                        type="number",
+                        placeholder="Limit (0 shows all)",
+                        value=default_limit,
+                        min=0,
+                        # the callbacks are fired when the user presses enter or leaves the input, instead of each key
+                        debounce=True
+                    )
+                ], style={'padding': '10px'}),
+            ], style={'width': '100%', 'display': 'flex', 'align-items': 'center', 'justify-content': 'center'}),
+        ], style={'padding': '10px'}),
+
+        # tables
+        Div([
+            # left div - table number of downloaded scenes by date
             Div([
-                # limit
+                # title
                 P(
-                    children='Limit (max. 1000):',
+                    children='Table: Number of Downloaded Scenes by date',
                     style={
                         'textAlign': 'center',
-                        'color': colors['text'],
-                        'margin-top': '20px'
+                        'color': colors['text']
                     }
                 ),
-                # date picker range
-                dcc_Input(
-                    id="download--input--limit",
-                    type="number",
-                    placeholder="Limit (max. 1000)",
-                    value=100,
-                    min=1,
-                    max=1000
-                )
-            ], style={'padding': '10px'}),
-        ], style={'width': '100%', 'display': 'flex', 'align-items': 'center', 'justify-content': 'center'}),
-    ], style={'padding': '10px'}),
-
-    # tables
-    Div([
-        # left div - table number of downloaded scenes by date
-        Div([
-            # title
-            P(
-                children='Table: Number of Downloaded Scenes by date',
-                style={
-                    'textAlign': 'center',
-                    'color': colors['text']
-                }
-            ),
-            # table number of download scenes
-            DataTable(
-                id='download--table--number-of-downloaded-scenes-by-date',
-                columns=[{"name": i, "id": i} for i in ('number', 'date')],
-                data=[],
-                fixed_rows={ 'headers': True, 'data': 0 },
-                **get_table_styles(),
-                sort_action='native',
-                sort_mode='multi',
-                filter_action='native',
-                page_size=50,
-            ),
-        ], style={'width': '30%', 'padding': '10px'}),
-
-        # right div - table number of downloaded scenes by user and date
-        Div([
-            # title
-            P(
-                children='Table: Number of Downloaded Scenes by user and date',
-                style={
-                    'textAlign': 'center',
-                    'color': colors['text']
-                }
-            ),
-            # table number of download scenes
-            DataTable(
-                id='download--table--number-of-downloaded-scenes-by-user-and-date',
-                columns=[{"name": i, "id": i} for i in ('number', 'user_id', 'name', 'date')],
-                data=[],
-                fixed_rows={ 'headers': True, 'data': 0 },
-                **get_table_styles(),
-                sort_action='native',
-                sort_mode='multi',
-                filter_action='native',
-                page_size=50,
-            ),
-        ], style={'width': '70%', 'padding': '10px'})
-    ], style={'width': '100%', 'display': 'flex', 'align-items': 'center', 'justify-content': 'center'}),
-
-    # graph
-    Loading(
-        id="download--loading--graph--time-series--number-of-downloaded-scenes-by-date",
-        type="circle",
-        color=colors['text'],
-        children=[
-            Graph(id='download--graph--graph--time-series--number-of-downloaded-scenes-by-date')
-        ]
-    ),
+                # table number of download scenes
+                DataTable(
+                    id='download--table--number-of-downloaded-scenes-by-date',
+                    columns=[{"name": i, "id": i} for i in ('number', 'date')],
+                    # the rows of the current page are paged, sorted and filtered by the server
+                    data=[],
+                    fixed_rows={ 'headers': True, 'data': 0 },
+                    **get_table_styles(),
+                    page_action='custom',
+                    page_current=0,
+                    page_size=50,
+                    sort_action='custom',
+                    sort_mode='multi',
+                    sort_by=[],
+                    filter_action='custom',
+                    filter_query='',
+                ),
+            ], style={'width': '30%', 'padding': '10px'}),
 
-    # map
-    Loading(
-        id="download--loading--map--number-of-downloaded-scenes-by-location",
-        type="circle",
-        color=colors['text'],
-        children=[
-            # leaflet map - my code
+            # right div - table number of downloaded scenes by user and date
             Div([
                 # title
                 P(
-                    children='Map: Number of Downloaded Scenes by Location (long/lat)',
+                    children='Table: Number of Downloaded Scenes by user and date',
                     style={
-                        'textAlign': 'left',
+                        'textAlign': 'center',
                         'color': colors['text']
                     }
                 ),
-                Map(
-                    [
-                        # tile layer
-                        TileLayer(),
-                        # markers
-                        GeoJSON(
-                            id="download--map--number-of-downloaded-scenes-by-location",
-                            cluster=True,  # when true, data are clustered
-                            zoomToBounds=True,  # when true, zooms to bounds when data changes
-                            clusterToLayer=scatter.cluster_to_layer,  # how to draw clusters
-                            zoomToBoundsOnClick=True,  # when true, zooms to bounds of feature (e.g. cluster) on click
-                            options={
-                                # how to draw points
-                                'pointToLayer': scatter.point_to_layer
-                            },
-                            superClusterOptions={
-                                # adjust cluster size
-                                'radius': 150
-                            },
-                            hideout={
-                                'colorscale': csc_map[default_csc],
-                                'color_prop': color_prop,
-                                **minmax
-                            }
-                        ),
-                        # *arrows,
-                        Colorbar(
-                            id="download--map--colorbar",
-                            colorscale=csc_map[default_csc],
-                            width=20,
-                            height=150,
-                            **minmax
-                        )
-                    ],
-                    zoom=5,
-                    center=(-15.0, -55.0),
-                    style={'width': '100%', 'height': '80vh', 'margin': "auto", "display": "block"},
+                # table number of download scenes
+                DataTable(
+                    id='download--table--number-of-downloaded-scenes-by-user-and-date',
+                    columns=[{"name": i, "id": i} for i in ('number', 'user_id', 'name', 'date')],
+                    # the rows of the current page are paged, sorted and filtered by the server
+                    data=[],
+                    fixed_rows={ 'headers': True, 'data': 0 },
+                    **get_table_styles(),
+                    page_action='custom',
+                    page_current=0,
+                    page_size=50,
+                    sort_action='custom',
+                    sort_mode='multi',
+                    sort_by=[],
+                    filter_action='custom',
+                    filter_query='',
                 ),
-                Div(
-                    Dropdown(
-                        id="download--map--dropdown--color-scale",
-                        options=csc_options,
-                        value=dumps(csc_map[default_csc]),
-                        clearable=False
+            ], style={'width': '70%', 'padding': '10px'})
+        ], style={'width': '100%', 'display': 'flex', 'align-items': 'center', 'justify-content': 'center'}),
+
+        # graph
+        Loading(
+            id="download--loading--graph--time-series--number-of-downloaded-scenes-by-date",
+            type="circle",
+            color=colors['text'],
+            children=[
+                Graph(id='download--graph--graph--time-series--number-of-downloaded-scenes-by-date')
+            ]
+        ),
+
+        # map
+        Loading(
+            id="download--loading--map--number-of-downloaded-scenes-by-location",
+            type="circle",
+            color=colors['text'],
+            children=[
+                # leaflet map - my code
+                Div([
+                    # title
+                    P(
+                        children='Map: Number of Downloaded Scenes by Location (long/lat)',
+                        style={
+                            'textAlign': 'left',
+                            'color': colors['text']
+                        }
                     ),
-                    style={"position": "relative", "bottom": "80px", "left": "10px", "z-index": "1000", "width": "200px"}
+                    Map(
+                        [
+                            # tile layer
+                            TileLayer(),
+                            # markers
+                            GeoJSON(
+                                id="download--map--number-of-downloaded-scenes-by-location",
+                                format='geojson',  # the callback changes it to `geobuf` if it is enabled
+                                # the data are clustered by the server according to the view of the map,
+                                # then the browser receives just the markers that it shows
+                                cluster=False,
+                                options={
+                                    # how to draw points and clusters
+                                    'pointToLayer': map_point_to_layer
+                                },
+                                hideout={
+                                    'colorscale': csc_map[default_csc],
+                                    'color_prop': color_prop,
+                                    **minmax
+                                }
+                            ),
+                            # *arrows,
+                            Colorbar(
+                                id="download--map--colorbar",
+                                colorscale=csc_map[default_csc],
+                                width=20,
+                                height=150,
+                                **minmax
+                            )
+                        ],
+                        id='download--map',
+                        zoom=default_map_zoom,
+                        center=default_map_center,
+                        style={'width': '100%', 'height': '80vh', 'margin': "auto", "display": "block"},
+                    ),
+                    Div(
+                        Dropdown(
+                            id="download--map--dropdown--color-scale",
+                            options=csc_options,
+                            value=dumps(csc_map[default_csc]),
+                            clearable=False
+                        ),
+                        style={"position": "relative", "bottom": "80px", "left": "10px", "z-index": "1000", "width": "200px"}
+                    )
+                    ]
+                    # style={'width': '100%', 'height': '100vh', 'margin': "auto", "display": "block"}
                 )
-                ]
-                # style={'width': '100%', 'height': '100vh', 'margin': "auto", "display": "block"}
-            )
-        ]
-    )
-])
+            ]
+        )
+    ])
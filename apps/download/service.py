@@ -1,9 +1,30 @@
 # -*- coding: utf-8 -*-
 
-from datetime import datetime as dt
-from json import dumps
+from datetime import datetime as dt, timedelta
+from functools import partial
+from json import dumps, loads
 
-from dash_leaflet.express import dicts_to_geojson
+from dash_leaflet.express import geojson_to_geobuf
+from numpy import array, datetime64, union1d
+from pandas import DataFrame, Series, read_csv, to_datetime
+from pandas.api.types import is_categorical_dtype, is_datetime64_any_dtype, is_numeric_dtype
+from plotly.utils import PlotlyJSONEncoder
+from werkzeug.exceptions import InternalServerError
+
+from apps.service import __get_figure_of_number_of_downloaded_scenes_time_series, compact_df, filter_df_by, \
+                         get_cached_figures, get_df_with_float64_coordinates, get_time_series_range_selector_ranges, \
+                         time_series_range_selector_buttons, update_filtered_df
+from modules.cache import LRUCache
+from modules.cluster import ClusterIndex, get_bounds, get_zoom_to_fit
+from modules.downsample import get_lttb_indexes
+from modules.environment import DOWNLOAD_CSV_FILE, FILTER_CACHE_SIZE, FILTER_CACHE_TTL, IS_TO_USE_GEOBUF, \
+                                IS_TO_USE_SQL_PUSHDOWN, MAP_CACHE_SIZE, TIME_SERIES_MAX_POINTS
+from modules.logging import logging
+from modules.metrics import add_rows_scanned
+from modules.model import DatabaseConnection
+from modules.rawjson import RawJSON
+from modules.sequencing import RequestSequencer
+from modules.snapshot import get_database_source_key, get_file_source_key, read_snapshot, write_snapshot
 
 
 ##################################################
@@ -56,6 +77,21 @@ from dash_leaflet.express import dicts_to_geojson
 #         )
 #     )
 
+####################
+# default parameters
+####################
+
+# the parameters of the page when it is opened, they are the ones that most users request
+default_limit = 100
+default_map_center = (-15.0, -55.0)
+default_map_zoom = 5
+
+
+def get_default_date_range(data):
+    # the first week of the data
+    return data['min_start_date'], data['min_start_date'] + timedelta(days=7)
+
+
 ####################
 # dash-leaflet map options
 ####################
@@ -73,6 +109,19 @@ default_csc = "Hot"
 
 color_prop='number'
 
+# the markers are clustered by the server on cells of `cluster_cell_size` pixels, until `cluster_max_zoom`,
+# then the browser receives just the markers of the current view
+cluster_cell_size = 128
+cluster_max_zoom = 16
+# the map does not inform its size, then the view is computed for a large screen
+map_viewport_size = (1920, 1080)
+# how to draw the points and the clusters, it is defined in `assets/download-map.js`
+map_point_to_layer = 'window.catalogDash.download.point_to_layer'
+
+
+# the dates are formatted (e.g. 2020-01-31) just to be displayed and filtered on the tables
+table_formatters = {'date': lambda dates: dates.dt.strftime('%Y-%m-%d')}
+
 
 def get_minmax_from_df(df, key='number'):
     # return {
@@ -85,6 +134,175 @@ def get_minmax_from_df(df, key='number'):
     }
 
 
+####################
+# dataframes
+####################
+
+def __compact_df(df):
+    return compact_df(
+        df, categories=['user_id', 'name'], coordinates=['longitude', 'latitude'], counts=['nofbs', 'number']
+    )
+
+
+def get_df_dd_nofbs(since=None):
+    # get the dash download nofbs dataframe (df_dd_nofbs) from the database
+    # nofbs - number of downloaded assets by scene
+    if DOWNLOAD_CSV_FILE:
+        # the CSV file does not change, then there are no newest rows
+        if since is not None:
+            return None
+
+        df_dd_nofbs = read_csv(DOWNLOAD_CSV_FILE)
+    else:
+        # if `since` is informed, then just the newest rows are returned
+        df_dd_nofbs = DatabaseConnection().select_from_dash_download_nofbs(since=since)
+
+    # convert `date` to `datetime64`, then it can be sorted and searched without Python objects
+    df_dd_nofbs['date'] = to_datetime(df_dd_nofbs['date'])
+
+    return __compact_df(df_dd_nofbs)
+
+
+def __get_df_information(data):
+    # create the information dataframe
+    return DataFrame(
+        [
+            ['Number of downloaded scenes', data['number_of_downloaded_scenes']],
+            ['Number of downloaded assets', data['number_of_downloaded_assets']],
+            ['Minimum date', data['min_start_date']],
+            ['Maximum date', data['max_end_date']]
+        ],
+        columns=['information', 'value']
+    )
+
+
+def create_download_data(df_dd_nofbs):
+    logging.info(
+        "create_download_data() - df_dd_nofbs.head(): \n"
+        f"{df_dd_nofbs[['scene_id', 'nofbs', 'user_id', 'date', 'longitude', 'latitude']].head()}\n"
+    )
+
+    # get the minimum and maximum dates
+    min_start_date = df_dd_nofbs['date'].min().date()
+    max_end_date = df_dd_nofbs['date'].max().date()
+
+    logging.info(f'create_download_data() - min_start_date: {min_start_date}')
+    logging.info(f'create_download_data() - max_end_date: {max_end_date}')
+
+    # df_d_base - number of downloaded scenes by user, date and long/lat
+    # this df contains all columns I need to build the tables and charts
+    # it is sorted by date, then a date range is found by binary search
+    df_d_base = filter_df_by(
+        df_dd_nofbs,
+        group_by=['user_id', 'name', 'date', 'longitude', 'latitude'],
+        sort_by=['date', 'number'],
+        ascending=[True, False]
+    )
+
+    logging.info(f'create_download_data() - df_d_base.head(): \n{df_d_base.head()}\n')
+
+    # just the grouped dataframe and the last rows are kept, the other rows are released
+    data = {
+        'df_d_base': __compact_df(df_d_base),
+        'minmax': get_minmax_from_df(df_d_base),
+        'min_start_date': min_start_date,
+        'max_end_date': max_end_date,
+        'number_of_downloaded_scenes': len(df_dd_nofbs),
+        'number_of_downloaded_assets': df_dd_nofbs['nofbs'].sum(),
+        # the rows of the last date (i.e. the watermark), they are fetched again on the next refresh
+        'df_tail': df_dd_nofbs[df_dd_nofbs['date'] == df_dd_nofbs['date'].max()]
+    }
+    data['df_information'] = __get_df_information(data)
+
+    logging.info(f"create_download_data() - df_information.head(): \n{data['df_information'].head()}\n")
+
+    return data
+
+
+def update_download_data(data, df_dd_nofbs):
+    # `df_dd_nofbs` contains the rows from the last date (i.e. `max_end_date`) on, then the rows
+    # from this date that are already in `data` (i.e. `df_tail`) are replaced by the new ones
+    logging.info(f'update_download_data() - number of fetched rows: {len(df_dd_nofbs)}\n')
+
+    df_removed = data['df_tail']
+
+    # the fetched rows are from the last date on, then they have the newest date
+    max_end_date = max(data['max_end_date'], df_dd_nofbs['date'].max().date())
+
+    # the categories of the old and new rows may be different, then the dataframe is compacted again
+    df_d_base = __compact_df(update_filtered_df(
+        data['df_d_base'], df_dd_nofbs, df_removed,
+        group_by=['user_id', 'name', 'date', 'longitude', 'latitude'],
+        sort_by=['date', 'number'],
+        ascending=[True, False]
+    ))
+
+    new_data = {
+        'df_d_base': df_d_base,
+        'minmax': get_minmax_from_df(df_d_base),
+        'min_start_date': data['min_start_date'],
+        'max_end_date': max_end_date,
+        'number_of_downloaded_scenes': data['number_of_downloaded_scenes'] - len(df_removed) + len(df_dd_nofbs),
+        'number_of_downloaded_assets': data['number_of_downloaded_assets'] - df_removed['nofbs'].sum() + \
+                                       df_dd_nofbs['nofbs'].sum(),
+        'df_tail': df_dd_nofbs[df_dd_nofbs['date'] == df_dd_nofbs['date'].max()]
+    }
+    new_data['df_information'] = __get_df_information(new_data)
+
+    return new_data
+
+
+def refresh_download_data(data):
+    # get just the rows from the last date on (i.e. the watermark)
+    df_dd_nofbs = get_df_dd_nofbs(since=data['max_end_date'])
+
+    if df_dd_nofbs is None or df_dd_nofbs.empty:
+        return None
+
+    # if there are just the rows already in memory, then nothing has changed
+    if len(df_dd_nofbs) == len(data['df_tail']) and df_dd_nofbs['date'].max().date() == data['max_end_date']:
+        return None
+
+    return update_download_data(data, df_dd_nofbs)
+
+
+def __get_snapshot_key():
+    if DOWNLOAD_CSV_FILE:
+        return get_file_source_key(DOWNLOAD_CSV_FILE)
+
+    return get_database_source_key('dash_download_nofbs')
+
+
+def read_download_data_from_snapshot():
+    # return the data of the snapshot (with `df_information`), or `None` if there is not a valid snapshot
+    data = read_snapshot('download', __get_snapshot_key())
+
+    if data is not None:
+        data['df_information'] = __get_df_information(data)
+
+    return data
+
+
+def get_download_data():
+    # if there is a valid snapshot, then the data is read from it instead of the database
+    data = read_download_data_from_snapshot()
+
+    if data is None:
+        return create_download_data(get_df_dd_nofbs())
+
+    # the database may have new rows since the snapshot was written
+    new_data = refresh_download_data(data)
+
+    return data if new_data is None else new_data
+
+
+def write_download_snapshot(store):
+    # `df_information` is built again from the other values
+    write_snapshot(
+        'download', __get_snapshot_key(), store.data, exclude=['df_information']
+    )
+
+
 ##################################################
 # callback services
 ##################################################
@@ -98,43 +316,368 @@ def __convert_dates_from_str_to_date(start_date, end_date):
 
 
 def __create_sub_df_based_on_parameters(df, start_date, end_date, limit):
-    # get a sub set from the df according to the selected date range
-    sub_df = df[
-        ((df['date'] >= start_date) & (df['date'] <= end_date))
-    ]
+    # the `date` column of the returned sub set is a `datetime64`, it should be converted
+    # to string just when the result (e.g. a table) is serialized
 
-    # reset the indexes to avoid the pandas warning related to SettingWithCopyWarning
-    sub_df.reset_index(drop=True, inplace=True)
+    # if the pushdown is enabled, the database groups the rows and it returns just the sub set
+    if IS_TO_USE_SQL_PUSHDOWN and not DOWNLOAD_CSV_FILE:
+        try:
+            sub_df = DatabaseConnection().select_count_from_dash_download_nofbs(start_date, end_date, limit)
+            sub_df['date'] = to_datetime(sub_df['date'])
 
-    # return the elements based on the limit, if it is possible
-    if limit > 0 and limit < len(sub_df.index):
-        sub_df = sub_df.iloc[:limit]
+            return sub_df
+
+        # if the database is not available, then the data in memory is used
+        except InternalServerError as error:
+            logging.warning('__create_sub_df_based_on_parameters() - the pushdown has failed: %s\n', error)
+
+    # `df` is sorted by date, then the selected date range is found by binary search
+    # and the sub set is a slice of `df`, instead of a copy
+    dates = df['date'].values
+    start = dates.searchsorted(datetime64(start_date, 'ns'), side='left')
+    end = dates.searchsorted(datetime64(end_date, 'ns'), side='right')
 
-    sub_df['date'] = sub_df['date'].astype(str)
+    sub_df = df.iloc[start:end]
+
+    add_rows_scanned(len(sub_df))
+
+    # return the elements with more downloaded scenes based on the limit, if it is possible
+    if limit > 0 and limit < len(sub_df.index):
+        sub_df = sub_df.nlargest(limit, 'number')
 
     return sub_df
 
 
-def __get_geojson_data(df):
-    # create a tooltip and popup
-    df['tooltip'] = df.apply(
-        lambda row: '({}, {})'.format(row["latitude"], row["longitude"]),
-        axis=1
+def __create_sub_dfs_based_on_parameters(df, start_date, end_date, limit, token=None):
+    # `token` is the request that needs the sub sets (see `request_sequencer`), if there is one,
+    # if it is superseded between the steps, then the next ones are not computed
+    request_sequencer.check(token)
+
+    # filter base dataframe based on start date, end date and limit
+    sub_df_d_base = __create_sub_df_based_on_parameters(df, start_date, end_date, limit)
+
+    request_sequencer.check(token)
+
+    # filter the previous dataframe to get the number of downloaded scenes by user and date
+    sub_df_ndsb_user_date = sub_df_d_base.groupby(['user_id', 'name', 'date'], observed=True)['number'].sum() \
+                                         .to_frame('number').reset_index()
+    sub_df_ndsb_user_date = sub_df_ndsb_user_date.sort_values(['number'], ascending=False)
+
+    request_sequencer.check(token)
+
+    # filter the previous dataframe to get the number of downloaded scenes by date only, sorted by date
+    sub_df_ndsb_date = sub_df_ndsb_user_date.groupby(['date'])['number'].sum().to_frame('number').reset_index()
+
+    return {
+        'sub_df_d_base': sub_df_d_base,
+        'sub_df_ndsb_user_date': sub_df_ndsb_user_date,
+        'sub_df_ndsb_date': sub_df_ndsb_date,
+        # the clusters of the map are created by zoom when they are requested
+        'cluster_index': ClusterIndex(
+            sub_df_d_base['longitude'].values, sub_df_d_base['latitude'].values, sub_df_d_base[color_prop].values,
+            cell_size=cluster_cell_size, max_zoom=cluster_max_zoom
+        )
+    }
+
+
+# the requests of each page are numbered by callback, then an old request is abandoned when there is a new one
+request_sequencer = RequestSequencer('download')
+
+
+# the tables, the chart and the map receive the same parameters on each interaction,
+# then the sub sets are created once and shared by their callbacks
+sub_dfs_cache = LRUCache('download--sub-dfs', maxsize=FILTER_CACHE_SIZE, ttl=FILTER_CACHE_TTL)
+
+
+def __get_sub_dfs_of_state(state, start_date, end_date, limit, token=None):
+    # `state` is the (version, data) of the store, it is read once by the caller, then the result
+    # is always cached with the version of the data that has created it;
+    # if the request `token` is superseded, then the sub sets are not created (the waiting requests create them)
+    version, data = state
+
+    # a limit that is not positive returns all the elements
+    limit = max(int(limit), 0)
+
+    # the version of the data is part of the key, then a refreshed data never uses an old result
+    key = (version, start_date, end_date, limit)
+
+    return sub_dfs_cache.get_or_set(
+        key, lambda: __create_sub_dfs_based_on_parameters(data['df_d_base'], start_date, end_date, limit, token)
+    )
+
+
+def get_sub_dfs_based_on_parameters(store, start_date, end_date, limit, token=None):
+    # the returned dataframes are shared, then they must not be changed by the callbacks
+    return __get_sub_dfs_of_state(store.state, start_date, end_date, limit, token)
+
+
+def get_time_series_figure_based_on_parameters(store, start_date, end_date, limit, xaxis_range=None, token=None):
+    # `xaxis_range` is the range that the user has zoomed in (e.g. by a button of the range selector)
+    # and `token` is the request of the callback (see `request_sequencer`), if there is one
+    # the figure is built with the same version of the data that is in its key
+    state = store.state
+    version = state[0]
+    limit = max(int(limit), 0)
+
+    def create_figure():
+        # the number of downloaded scenes by date, it is already sorted by date
+        sub_df = __get_sub_dfs_of_state(state, start_date, end_date, limit, token)['sub_df_ndsb_date']
+
+        # if the user has already changed the parameters, then the figure is not built
+        request_sequencer.check(token)
+
+        sub_df = __downsample_time_series(sub_df, xaxis_range)
+        sub_df = sub_df.assign(date=sub_df['date'].dt.strftime('%Y-%m-%d'))
+
+        return __get_figure_of_number_of_downloaded_scenes_time_series(
+            sub_df,
+            title='Time Series: Number of Download Scenes by Date',
+            xaxis_range=xaxis_range,
+            # the zoom of the user is kept until the parameters change
+            uirevision='{}/{}/{}'.format(start_date, end_date, limit) if TIME_SERIES_MAX_POINTS > 0 else None
+        )
+
+    xaxis_range_key = tuple(xaxis_range) if xaxis_range else None
+
+    return get_cached_figures(
+        ('download--graph--time-series', version, start_date, end_date, limit, xaxis_range_key), create_figure
     )
-    df['popup'] = df.apply(
-        lambda row: '''
-            User ID: {}<br>
-            Number: {}<br>
-            Date: {}<br>
-            Latitude: {}<br>
-            Longitude: {}
-        '''.format(
-            row["user_id"], row["number"], row["date"], row["latitude"], row["longitude"]
-        ),
-        axis=1
+
+
+def __get_json_values(series):
+    # the values of `series` encoded as JSON texts, column by column
+    if is_categorical_dtype(series.dtype):
+        # each category is encoded once, the code `-1` (i.e. a missing value) takes the last item (i.e. `null`)
+        categories = array([dumps(category) for category in series.cat.categories.tolist()] + ['null'], dtype=object)
+        return Series(categories[series.cat.codes.values], index=series.index)
+
+    if is_datetime64_any_dtype(series.dtype):
+        return '"' + series.dt.strftime('%Y-%m-%d') + '"'
+
+    if is_numeric_dtype(series.dtype):
+        return series.astype(str)
+
+    return series.map(dumps)
+
+
+def __get_geojson_features(df):
+    # return the markers of `df` as a list of JSON texts, they are built column by column,
+    # instead of creating a dict for each row and serializing it later
+    df = get_df_with_float64_coordinates(df)
+
+    latitude = df['latitude'].astype(str)
+    longitude = df['longitude'].astype(str)
+
+    # the properties of the markers are all the columns, except the coordinates
+    properties = {
+        column: __get_json_values(df[column]) for column in df.columns if column not in ('latitude', 'longitude')
+    }
+
+    # create a tooltip and popup, the user id is the only text that may need to be escaped
+    properties['tooltip'] = '"(' + latitude + ', ' + longitude + ')"'
+    properties['popup'] = (
+        '"User ID: ' + __get_json_values(df['user_id'].astype(str)).str[1:-1] +
+        '<br>Number: ' + df['number'].astype(str) +
+        '<br>Date: ' + properties['date'].str[1:-1] +
+        '<br>Latitude: ' + latitude +
+        '<br>Longitude: ' + longitude + '"'
+    )
+
+    properties_as_json = None
+
+    for name, values in properties.items():
+        item = '"{}":'.format(name) + values
+        properties_as_json = item if properties_as_json is None else properties_as_json + ',' + item
+
+    features = (
+        '{"type":"Feature","geometry":{"type":"Point","coordinates":[' + longitude + ',' + latitude + ']},'
+        '"properties":{' + properties_as_json + '}}'
+    )
+
+    return features.tolist()
+
+
+def __get_feature_collection(features):
+    # `features` are JSON texts
+    return '{"type":"FeatureCollection","features":[' + ','.join(features) + ']}'
+
+
+def __get_geojson_data(df):
+    # return the markers of `df` as a GeoJSON text, it is sent to the browser as it is (see `__get_map_data`)
+    return __get_feature_collection(__get_geojson_features(df))
+
+
+def __get_xaxis_range_from_relayout_data(relayout_data):
+    # return the range of the x axis that the user has zoomed in, or `None` if the whole chart is shown
+    if not relayout_data:
+        return None
+
+    # zoom in the chart
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+
+    # range slider
+    if 'xaxis.range' in relayout_data:
+        return relayout_data['xaxis.range']
+
+    return None
+
+
+def __downsample_time_series(df, xaxis_range=None, max_points=TIME_SERIES_MAX_POINTS):
+    # return the points of `df` (sorted by date) to be plotted, if there are more than `max_points`,
+    # then they are selected by LTTB in the whole series and again in the range that the user has zoomed in,
+    # in order to show the visible range with more details
+    if max_points <= 0 or len(df.index) <= max_points:
+        return df
+
+    dates = df['date'].values
+    x = dates.astype('int64')
+    y = df['number'].values
+
+    indexes = get_lttb_indexes(x, y, max_points)
+
+    if xaxis_range:
+        start = dates.searchsorted(to_datetime(xaxis_range[0]).to_datetime64(), side='left')
+        end = dates.searchsorted(to_datetime(xaxis_range[1]).to_datetime64(), side='right')
+
+        # the points outside the visible range are kept as the context of the range slider
+        indexes = union1d(
+            indexes[(indexes < start) | (indexes >= end)],
+            start + get_lttb_indexes(x[start:end], y[start:end], max_points)
+        )
+
+    logging.info('__downsample_time_series() - points: %s -> %s\n', len(df.index), len(indexes))
+
+    return df.iloc[indexes]
+
+
+def __get_abbreviated_count(count):
+    # e.g. 1234 -> '1.2k', in the same way as the clusters created by the browser
+    if count >= 10000:
+        return '{}k'.format(round(count / 1000))
+    if count >= 1000:
+        return '{}k'.format(round(count / 100) / 10)
+
+    return str(count)
+
+
+def __get_clustered_geojson_data(sub_dfs, center, zoom):
+    # return the markers inside the view of the map, the near points are grouped as clusters
+    width, height = map_viewport_size
+
+    points, clusters = sub_dfs['cluster_index'].get_clusters(zoom, get_bounds(center, zoom, width, height))
+
+    # the points that are not in a cluster have the same properties as before
+    features = __get_geojson_features(sub_dfs['sub_df_d_base'].iloc[points])
+
+    # there are just a few clusters in a view, then they are serialized one by one
+    features.extend(
+        dumps({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [cluster['longitude'], cluster['latitude']]},
+            'properties': {
+                'cluster': True,
+                'point_count': cluster['count'],
+                'point_count_abbreviated': __get_abbreviated_count(cluster['count']),
+                # mean value of the points, it is used to color the cluster
+                color_prop: cluster['value'],
+                'tooltip': 'Number of points: {}'.format(cluster['count']),
+                # when the cluster is clicked, the map zooms in until its points are shown
+                'expansion_zoom': min(
+                    max(get_zoom_to_fit(cluster['bounds'], width, height), int(zoom) + 1), cluster_max_zoom + 1
+                )
+            }
+        }, cls=PlotlyJSONEncoder)
+        for cluster in clusters
     )
 
-    # create the markers based on the dataframe
-    geojson = dicts_to_geojson(df.to_dict('rows'), lat="latitude", lon="longitude")
+    return __get_feature_collection(features)
+
+
+def __get_map_data(geojson):
+    # return the data of the map and its format (i.e. `geobuf` or `geojson`), `geojson` is a GeoJSON text,
+    # that is sent as it is (see `modules/rawjson.py`)
+    if IS_TO_USE_GEOBUF:
+        try:
+            return geojson_to_geobuf(loads(geojson)), 'geobuf'
+
+        # if the markers can not be encoded, then they are sent as plain GeoJSON
+        except Exception as error:
+            logging.warning('__get_map_data() - the geobuf encoding has failed: %s\n', error)
+
+    return RawJSON(geojson), 'geojson'
+
+
+# every user who opens the page requests the map of the default view
+map_data_cache = LRUCache('download--map-data', maxsize=MAP_CACHE_SIZE, ttl=FILTER_CACHE_TTL)
+
+
+def get_map_data_based_on_parameters(store, start_date, end_date, limit, center, zoom, token=None):
+    # return the data of the map (i.e. the markers and the clusters in its view) and its format,
+    # `token` is the request of the callback (see `request_sequencer`), if there is one
+
+    # the map is built with the same version of the data that is in its key
+    state = store.state
+    limit = max(int(limit), 0)
+
+    key = (state[0], start_date, end_date, limit, tuple(center), zoom)
+
+    def create_map_data():
+        sub_dfs = __get_sub_dfs_of_state(state, start_date, end_date, limit, token)
+
+        # if the user has already changed the parameters (e.g. moved the map again), then the markers are not built
+        request_sequencer.check(token)
+
+        # build the geojson object with the markers and the clusters in the view of the map
+        geojson = __get_clustered_geojson_data(sub_dfs, center, zoom)
+
+        request_sequencer.check(token)
+
+        return __get_map_data(geojson)
+
+    return map_data_cache.get_or_set(key, create_map_data)
+
+
+##################################################
+# warm-up services
+##################################################
+
+def __get_time_series_figure_of_range_selector(store, start_date, end_date, limit, label):
+    # the figure that the button `label` of the range selector shows, the range ends on the last date of the chart
+    sub_df = get_sub_dfs_based_on_parameters(store, start_date, end_date, limit)['sub_df_ndsb_date']
+
+    if sub_df.empty:
+        return None
+
+    xaxis_range = get_time_series_range_selector_ranges(sub_df['date'].iloc[-1].date())[label]
+
+    return get_time_series_figure_based_on_parameters(store, start_date, end_date, limit, xaxis_range)
+
+
+def get_warmup_tasks(store):
+    # the tables, the time series and the map of the page when it is opened (see `modules/warmup.py`)
+    start_date, end_date = get_default_date_range(store.data)
+
+    tasks = [
+        ('tables', partial(get_sub_dfs_based_on_parameters, store, start_date, end_date, default_limit)),
+        ('time series', partial(get_time_series_figure_based_on_parameters, store, start_date, end_date, default_limit)),
+        ('map', partial(
+            get_map_data_based_on_parameters,
+            store, start_date, end_date, default_limit, default_map_center, default_map_zoom
+        ))
+    ]
+
+    # the buttons of the range selector request a new figure just if the points are downsampled
+    if TIME_SERIES_MAX_POINTS > 0:
+        tasks.extend(
+            (
+                'time series - {}'.format(button['label']),
+                partial(
+                    __get_time_series_figure_of_range_selector, store, start_date, end_date, default_limit,
+                    button['label']
+                )
+            )
+            for button in time_series_range_selector_buttons if button['step'] != 'all'
+        )
 
-    return geojson
+    return tasks
@@ -1,32 +1,49 @@
 # -*- coding: utf-8 -*-
 
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output
 from datetime import datetime as dt
 from re import split
 
 from app import app
+from modules.environment import IS_TO_USE_CLIENTSIDE_FILTERING
 from modules.logging import logging
+from modules.metrics import instrument_callback
+from modules.table import get_page_of_df
 
-from apps.service import __get_date_picker_range_message, \
-                         __get_figure_of_graph_bubble_map_number_of_scenes, \
-                         __get_logical_date_range
+from apps.service import __get_date_picker_range_message
 from apps.scene.layout import *
-from apps.scene.service import get_figure_of_graph_bar_plot_number_of_scenes
+from apps.scene.service import get_figures_based_on_date_range, table_formatters
 
 
 @app.callback(
     Output('scene--output-container-date-picker-range', 'children'),
     [Input('scene--date-picker-range', 'start_date'),
     Input('scene--date-picker-range', 'end_date')])
+@instrument_callback
 def scene__update_output_container_date_picker_range(start_date, end_date):
     return __get_date_picker_range_message(start_date, end_date)
 
 
 @app.callback(
-    [Output('scene--graph--bar-plot--number-of-scenes', 'figure'),
-    Output('scene--graph--bubble-map--number-of-scenes--with-animation-frame', 'figure')],
-    [Input('scene--date-picker-range', 'start_date'),
-    Input('scene--date-picker-range', 'end_date')])
+    [Output('scene--table--number-of-scenes', 'data'),
+    Output('scene--table--number-of-scenes', 'page_count')],
+    [Input('scene--table--number-of-scenes', 'page_current'),
+    Input('scene--table--number-of-scenes', 'page_size'),
+    Input('scene--table--number-of-scenes', 'sort_by'),
+    Input('scene--table--number-of-scenes', 'filter_query')])
+@instrument_callback
+def scene__update_table_number_of_scenes(page_current, page_size, sort_by, filter_query):
+    logging.info('scene__update_table_number_of_scenes()')
+
+    logging.info('scene__update_table_number_of_scenes() - page_current: %s', page_current)
+    logging.info('scene__update_table_number_of_scenes() - sort_by: %s', sort_by)
+    logging.info('scene__update_table_number_of_scenes() - filter_query: %s', filter_query)
+
+    return get_page_of_df(
+        scene_store.data['df_sd_dataset_year_month'], page_current, page_size, sort_by, filter_query, table_formatters
+    )
+
+
 def scene__update_graph_x_number_of_scenes_based_on_date_picker_range(start_date, end_date):
     logging.info('update_graph_number_of_scenes()\n')
 
@@ -42,24 +59,27 @@ def scene__update_graph_x_number_of_scenes_based_on_date_picker_range(start_date
 
     logging.info('update_graph_number_of_scenes() - xaxis_range: %s\n', xaxis_range)
 
-    figure_01 = get_figure_of_graph_bar_plot_number_of_scenes(
-        df_sd_dataset_year_month,
-        xaxis_range=xaxis_range,
-        title='Number of Scenes by Dataset'
-    )
+    return get_figures_based_on_date_range(scene_store, xaxis_range)
 
-    # get a sub set from the df according to the selected date range
-    df_copy = df_sd_ds_ym_long_lat[
-        __get_logical_date_range(df_sd_ds_ym_long_lat, xaxis_range)
-    ]
-
-    figure_02 = __get_figure_of_graph_bubble_map_number_of_scenes(
-        df_copy,
-        sort_by=['year_month', 'dataset'],
-        title='Number of Scenes by Dataset in a specific location (long/lat)',
-        color='dataset',
-        # animation_frame='year_month',
-        hover_data=['year_month']
-    )
 
-    return figure_01, figure_02
+scene_figures_outputs = [
+    Output('scene--graph--bar-plot--number-of-scenes', 'figure'),
+    Output('scene--graph--bubble-map--number-of-scenes--with-animation-frame', 'figure')
+]
+
+if IS_TO_USE_CLIENTSIDE_FILTERING:
+    # the browser filters the cube that it has received with the page and it builds the figures,
+    # then a change of the date range does not send a request to the server (see `assets/scene-clientside.js`)
+    app.clientside_callback(
+        ClientsideFunction(namespace='scene', function_name='update_figures'),
+        scene_figures_outputs,
+        [Input('scene--date-picker-range', 'start_date'),
+        Input('scene--date-picker-range', 'end_date'),
+        Input('scene--store--clientside-cube', 'data')]
+    )
+else:
+    app.callback(
+        scene_figures_outputs,
+        [Input('scene--date-picker-range', 'start_date'),
+        Input('scene--date-picker-range', 'end_date')]
+    )(instrument_callback(scene__update_graph_x_number_of_scenes_based_on_date_picker_range))
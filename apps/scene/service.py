@@ -1,35 +1,328 @@
 # -*- coding: utf-8 -*-
 
+from datetime import datetime as dt
+from json import dumps, loads
+
+from dateutil.relativedelta import relativedelta
+from pandas import Categorical, read_csv, to_datetime, DataFrame
 import plotly.express as px
 from plotly.graph_objects import Figure, Bar
+from plotly.utils import PlotlyJSONEncoder
+from werkzeug.exceptions import InternalServerError
 
-from apps.service import __get_logical_date_range
+from apps.service import __get_figure_of_graph_bubble_map_number_of_scenes, __get_logical_date_range, \
+                         compact_df, filter_df_by, get_cached_figures, get_df_with_float64_coordinates, \
+                         update_filtered_df
+from modules.cube import PrefixSumCube, get_month_ordinal, get_month_ordinals, get_year_months
+from modules.environment import IS_TO_USE_CLIENTSIDE_FILTERING, IS_TO_USE_DATA_FROM_DB, IS_TO_USE_SQL_PUSHDOWN
 from modules.exception import CatalogDashException
 from modules.logging import logging
+from modules.metrics import add_rows_scanned
+from modules.model import DatabaseConnection
+from modules.snapshot import get_database_source_key, get_file_source_key, read_snapshot, write_snapshot
 from modules.utils import colors
 
 
+scene_dataset_csv_file = 'data/scene_dataset.csv'
+
+# these values are built from the other ones, then they are not saved on the snapshots
+derived_data_keys = ['df_information', 'cube_dataset_year_month', 'cube_ds_ym_long_lat', 'clientside_cube']
+
+# the months are formatted (e.g. 2020-01) just to be displayed and filtered on the table
+table_formatters = {'year_month': get_year_months}
+
+# the same titles are used by the figures built by the server and by the browser
+bar_plot_title = 'Number of Scenes by Dataset'
+bubble_map_title = 'Number of Scenes by Dataset in a specific location (long/lat)'
+
+
 ##################################################
 # layout services
 ##################################################
 
+def get_default_date_range(data):
+    # the first month of the data, it is the date range of the page when it is opened
+    return data['min_start_date'], data['min_start_date'] + relativedelta(months=1)
+
+
 def copy_and_organize_df(df):
-    # create a copy from the original df
-    df_copy = df.copy()
+    # create a shallow copy from the original df, then adding a column does not change the original one
+    df_copy = df.copy(deep=False)
 
-    # extract year_month from my date
-    df_copy['year_month'] = df_copy['date'].map(lambda date: date.strftime('%Y-%m'))
+    # extract year_month from my date, as the number of months since the year 0 (e.g. 2020-01 -> 24240),
+    # it is formatted as a string just to be displayed
+    df_copy['year_month'] = get_month_ordinals(df_copy['date'])
 
     return df_copy
 
 
+def __compact_df(df):
+    return compact_df(df, categories=['dataset'], coordinates=['longitude', 'latitude'], counts=['number'])
+
+
+def get_df_scene_dataset(since=None):
+    if IS_TO_USE_DATA_FROM_DB:
+        # get the data from the database, if `since` is informed, then just the newest rows are returned
+        df_scene_dataset = DatabaseConnection().select_from_scene_dataset(since=since)
+    else:
+        # the CSV file does not change, then there are no newest rows
+        if since is not None:
+            return None
+
+        # get the data from a CSV file
+        df_scene_dataset = read_csv(scene_dataset_csv_file)
+        df_scene_dataset['date'] = to_datetime(df_scene_dataset['date'])
+
+    # `date` is kept as `datetime64`, instead of `datetime.date` objects
+    return __compact_df(df_scene_dataset)
+
+
+def __get_df_information(data):
+    # create a df with the information from `data`
+    return DataFrame(
+        [
+            ['Number of available datasets', len(data['df_sd_dataset_year_month'].dataset.unique())],
+            ['Number of scenes', data['number_of_scenes']],
+            ['Minimum date', data['min_start_date']],
+            ['Maximum date', data['max_end_date']]
+        ],
+        columns=['information', 'value']
+    )
+
+
+def __add_derived_data(data):
+    data['df_information'] = __get_df_information(data)
+
+    # the cubes have the number of scenes by dataset (and location) and month, with cumulative sums along
+    # the months, then they answer the date range queries without scanning the dataframes
+    # the datasets keep the order of `df_sd_dataset_year_month` (i.e. the order of the bars)
+    data['cube_dataset_year_month'] = PrefixSumCube(
+        data['df_sd_dataset_year_month'], group_by=['dataset'], sort=False
+    )
+    data['cube_ds_ym_long_lat'] = PrefixSumCube(
+        data['df_sd_ds_ym_long_lat'], group_by=['dataset', 'longitude', 'latitude']
+    )
+
+    if IS_TO_USE_CLIENTSIDE_FILTERING:
+        data['clientside_cube'] = __get_clientside_cube(data)
+
+    return data
+
+
+def __get_clientside_cube(data):
+    # the number of scenes by dataset, month and location as compact columns (i.e. the datasets and the locations
+    # are codes), that the browser filters by the date range in order to build the figures
+    # (see `assets/scene-clientside.js`)
+    datasets = data['cube_dataset_year_month'].keys['dataset']
+
+    df_bar = data['df_sd_dataset_year_month']
+    df_map = get_df_with_float64_coordinates(data['df_sd_ds_ym_long_lat'])
+
+    # each location is sent once, the rows keep just its code
+    locations = df_map.groupby(['longitude', 'latitude'], sort=False).ngroup()
+    df_locations = df_map.loc[~locations.duplicated().values, ['longitude', 'latitude']]
+
+    # the figures without data are the templates of the figures built by the browser (the datasets are strings,
+    # as in the sub sets returned by the cubes), the bubble map has one point just to create the trace
+    # that is copied to each dataset
+    figures = [
+        get_figure_of_graph_bar_plot_number_of_scenes(
+            df_bar.iloc[0:0].astype({'dataset': 'object'}), xaxis_range=['0000-01', '0000-01'],
+            title=bar_plot_title, datasets=datasets
+        ),
+        __get_figure_of_graph_bubble_map_number_of_scenes(
+            df_map.iloc[0:1], sort_by=['year_month', 'dataset'], title=bubble_map_title,
+            color='dataset', hover_data=['year_month']
+        )
+    ]
+
+    return {
+        'datasets': datasets.tolist(),
+        'bar': {
+            'dataset': Categorical(df_bar['dataset'], categories=datasets).codes.tolist(),
+            'year_month': df_bar['year_month'].tolist(),
+            'number': df_bar['number'].tolist()
+        },
+        'map': {
+            'dataset': Categorical(df_map['dataset'], categories=datasets).codes.tolist(),
+            'year_month': df_map['year_month'].tolist(),
+            'location': locations.tolist(),
+            'number': df_map['number'].tolist()
+        },
+        'locations': {
+            'longitude': df_locations['longitude'].tolist(),
+            'latitude': df_locations['latitude'].tolist()
+        },
+        'figures': loads(dumps(figures, cls=PlotlyJSONEncoder))
+    }
+
+
+def create_scene_data(df_scene_dataset):
+    logging.info('create_scene_data()')
+
+    # get the minimum and maximum dates
+    min_start_date = df_scene_dataset['date'].min().date()
+    max_end_date = df_scene_dataset['date'].max().date()
+
+    logging.info('create_scene_data() - min_start_date: %s', min_start_date)
+    logging.info('create_scene_data() - max_end_date: %s\n', max_end_date)
+
+    # the same copy (with `year_month`) is used to build both dataframes
+    df_sd_copy = copy_and_organize_df(df_scene_dataset)
+
+    # I group my df by 'dataset' and 'year_month' to build the table
+    df_sd_dataset_year_month = filter_df_by(
+        df_sd_copy,
+        group_by=['dataset', 'year_month'],
+        sort_by=['year_month', 'dataset'],
+        ascending=False
+    )
+
+    logging.info('create_scene_data() - df_sd_dataset_year_month.head(): \n%s\n', df_sd_dataset_year_month.head())
+
+    # I group my df by 'dataset', 'year_month', longitude' and 'latitude' to build the map
+    df_sd_ds_ym_long_lat = filter_df_by(
+        df_sd_copy,
+        group_by=['dataset', 'year_month', 'longitude', 'latitude'],
+        sort_by=['year_month', 'dataset', 'longitude', 'latitude']
+    )
+
+    logging.info('create_scene_data() - df_sd_ds_ym_long_lat.head(): \n%s\n', df_sd_ds_ym_long_lat.head())
+
+    # just the grouped dataframes and the last rows are kept, the other rows are released
+    data = {
+        'df_sd_dataset_year_month': __compact_df(df_sd_dataset_year_month),
+        'df_sd_ds_ym_long_lat': __compact_df(df_sd_ds_ym_long_lat),
+        'min_start_date': min_start_date,
+        'max_end_date': max_end_date,
+        'number_of_scenes': len(df_scene_dataset),
+        # the rows of the last date (i.e. the watermark), they are fetched again on the next refresh
+        'df_tail': df_scene_dataset[df_scene_dataset['date'] == df_scene_dataset['date'].max()]
+    }
+    __add_derived_data(data)
+
+    logging.info('create_scene_data() - df_information.head(): \n%s\n', data['df_information'].head())
+
+    return data
+
+
+def update_scene_data(data, df_scene_dataset):
+    # `df_scene_dataset` contains the rows from the last date (i.e. `max_end_date`) on, then the rows
+    # from this date that are already in `data` (i.e. `df_tail`) are replaced by the new ones
+    logging.info('update_scene_data() - number of fetched rows: %s\n', len(df_scene_dataset))
+
+    df_removed = copy_and_organize_df(data['df_tail'])
+    df_added = copy_and_organize_df(df_scene_dataset)
+
+    # the fetched rows are from the last date on, then they have the newest date
+    max_end_date = max(data['max_end_date'], df_scene_dataset['date'].max().date())
+
+    # the categories of the old and new rows may be different, then the dataframes are compacted again
+    new_data = {
+        'df_sd_dataset_year_month': __compact_df(update_filtered_df(
+            data['df_sd_dataset_year_month'], df_added, df_removed,
+            group_by=['dataset', 'year_month'],
+            sort_by=['year_month', 'dataset'],
+            ascending=False
+        )),
+        'df_sd_ds_ym_long_lat': __compact_df(update_filtered_df(
+            data['df_sd_ds_ym_long_lat'], df_added, df_removed,
+            group_by=['dataset', 'year_month', 'longitude', 'latitude'],
+            sort_by=['year_month', 'dataset', 'longitude', 'latitude']
+        )),
+        'min_start_date': data['min_start_date'],
+        'max_end_date': max_end_date,
+        'number_of_scenes': data['number_of_scenes'] - len(df_removed) + len(df_added),
+        'df_tail': df_scene_dataset[df_scene_dataset['date'] == df_scene_dataset['date'].max()]
+    }
+    return __add_derived_data(new_data)
+
+
+def refresh_scene_data(data):
+    # get just the rows from the last date on (i.e. the watermark)
+    df_scene_dataset = get_df_scene_dataset(since=data['max_end_date'])
+
+    if df_scene_dataset is None or df_scene_dataset.empty:
+        return None
+
+    # if there are just the rows already in memory, then nothing has changed
+    if len(df_scene_dataset) == len(data['df_tail']) and \
+            df_scene_dataset['date'].max().date() == data['max_end_date']:
+        return None
+
+    return update_scene_data(data, df_scene_dataset)
+
+
+def __get_snapshot_key():
+    if IS_TO_USE_DATA_FROM_DB:
+        return get_database_source_key('scene_dataset')
+
+    return get_file_source_key(scene_dataset_csv_file)
+
+
+def read_scene_data_from_snapshot():
+    # return the data of the snapshot (with the derived data), or `None` if there is not a valid snapshot
+    data = read_snapshot('scene', __get_snapshot_key())
+
+    return None if data is None else __add_derived_data(data)
+
+
+def get_scene_data():
+    # if there is a valid snapshot, then the data is read from it instead of the source
+    data = read_scene_data_from_snapshot()
+
+    if data is None:
+        return create_scene_data(get_df_scene_dataset())
+
+    # the database may have new rows since the snapshot was written
+    new_data = refresh_scene_data(data)
+
+    return data if new_data is None else new_data
+
+
+def write_scene_snapshot(store):
+    write_snapshot('scene', __get_snapshot_key(), store.data, exclude=derived_data_keys)
+
+
 ##################################################
 # callback services
 ##################################################
 
+def get_sub_dfs_based_on_date_range(data, xaxis_range):
+    # return the sub sets of `df_sd_dataset_year_month` and `df_sd_ds_ym_long_lat` according to the selected date range
+
+    # if the pushdown is enabled, the database groups the rows and it returns just the sub sets
+    if IS_TO_USE_DATA_FROM_DB and IS_TO_USE_SQL_PUSHDOWN:
+        # the range contains the whole months, from the first day of the start month
+        # to the first day of the month after the end month
+        start_date = dt.strptime(xaxis_range[0][:7], '%Y-%m').date()
+        end_date = dt.strptime(xaxis_range[1][:7], '%Y-%m').date() + relativedelta(months=1)
+
+        try:
+            db = DatabaseConnection()
+
+            return db.select_count_from_scene_dataset(start_date, end_date), \
+                   db.select_count_from_scene_dataset(start_date, end_date, group_by_location=True)
+
+        # if the database is not available, then the data in memory is used
+        except InternalServerError as error:
+            logging.warning('get_sub_dfs_based_on_date_range() - the pushdown has failed: %s\n', error)
+
+    start_month = get_month_ordinal(xaxis_range[0])
+    end_month = get_month_ordinal(xaxis_range[1])
+
+    # the sub sets are sorted in the same way of the original dataframes
+    df_dataset_year_month = data['cube_dataset_year_month'].to_df(start_month, end_month, ascending=False)
+    df_ds_ym_long_lat = data['cube_ds_ym_long_lat'].to_df(start_month, end_month)
+
+    add_rows_scanned(len(df_dataset_year_month) + len(df_ds_ym_long_lat))
+
+    return df_dataset_year_month, df_ds_ym_long_lat
+
+
 def get_figure_of_graph_bar_plot_number_of_scenes(df, xaxis_range=[], title=None, animation_frame=None,
                                                   is_scatter_geo=True, sort_ascending=True,
-                                                  sort_by=['year_month', 'dataset']):
+                                                  sort_by=['year_month', 'dataset'], datasets=None):
     logging.info('get_figure_of_graph_bar_plot_number_of_scenes()')
 
     figure_height = 800
@@ -40,12 +333,23 @@ def get_figure_of_graph_bar_plot_number_of_scenes(df, xaxis_range=[], title=None
 
     logical_date_range = __get_logical_date_range(df_copy, xaxis_range)
 
+    # the datasets to be plotted, a dataset without scenes in the range has an empty bar
+    if datasets is None:
+        datasets = df_copy['dataset'].unique()
+
+    # the months are formatted (e.g. 2020-01) just to be displayed
+    df_copy = df_copy[logical_date_range]
+    df_copy = df_copy.assign(year_month=get_year_months(df_copy['year_month']))
+
+    # split the df by dataset once, instead of filtering it for each dataset
+    sub_dfs = dict(tuple(df_copy.groupby('dataset', sort=False)))
+
     # I'm goint to build the `data` parameter of `Figure`
     data = []
 
     # I would like to build each `bar` based on each dataset
-    for dataset in df_copy['dataset'].unique():
-        sub_df = df_copy[(df_copy['dataset'] == dataset) & logical_date_range]
+    for dataset in datasets:
+        sub_df = sub_dfs.get(dataset, df_copy.iloc[0:0])
 
         hovertext = 'Number of Scenes: ' + sub_df['number'].map(str) + '<br>' + \
                     'Period: ' + sub_df['year_month'].map(str) + '<br>' + \
@@ -83,3 +387,53 @@ def get_figure_of_graph_bar_plot_number_of_scenes(df, xaxis_range=[], title=None
     fig.update_layout(barmode='group', height=figure_height, xaxis_tickangle=-45)
 
     return fig
+
+
+def get_figures_based_on_date_range(store, xaxis_range):
+    # the bar plot and the bubble map of the date range `xaxis_range` (e.g. ['2020-01-01', '2020-02-01'])
+
+    # get the current version of the data once, then both figures are built with the same version
+    version, data = store.state
+
+    def create_figures():
+        # get a sub set from the dfs according to the selected date range
+        df_sd_dataset_year_month, df_copy = get_sub_dfs_based_on_date_range(data, xaxis_range)
+
+        figure_01 = get_figure_of_graph_bar_plot_number_of_scenes(
+            df_sd_dataset_year_month,
+            xaxis_range=xaxis_range,
+            title=bar_plot_title,
+            # all the datasets are in the legend, even the ones without scenes in the range
+            datasets=data['cube_dataset_year_month'].keys['dataset']
+        )
+
+        figure_02 = __get_figure_of_graph_bubble_map_number_of_scenes(
+            df_copy,
+            sort_by=['year_month', 'dataset'],
+            title=bubble_map_title,
+            color='dataset',
+            # animation_frame='year_month',
+            hover_data=['year_month']
+        )
+
+        return [figure_01, figure_02]
+
+    return get_cached_figures(
+        ('scene--graph--number-of-scenes', version, xaxis_range[0], xaxis_range[1]), create_figures
+    )
+
+
+##################################################
+# warm-up services
+##################################################
+
+def get_warmup_tasks(store):
+    # the figures of the page when it is opened (see `modules/warmup.py`), if the browser builds them,
+    # then there is nothing to compute
+    if IS_TO_USE_CLIENTSIDE_FILTERING:
+        return []
+
+    start_date, end_date = get_default_date_range(store.data)
+    xaxis_range = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+
+    return [('figures', lambda: get_figures_based_on_date_range(store, xaxis_range))]
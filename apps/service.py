@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 
-from datetime import datetime as dt
-from pandas import set_option
+from datetime import datetime as dt, timedelta
+from json import dumps
+from pandas import concat, set_option
+from pandas.api.types import is_categorical_dtype
 import plotly.express as px
+from plotly.utils import PlotlyJSONEncoder
 
+from modules.cache import LRUCache
+from modules.cube import get_month_ordinal, get_year_months
+from modules.environment import FIGURE_CACHE_MAX_BYTES, FIGURE_CACHE_SIZE, FIGURE_CACHE_TTL
 from modules.exception import CatalogDashException
 from modules.logging import logging
+from modules.rawjson import RawJSON
 from modules.utils import colors, get_formatted_date_as_string
 
 
@@ -71,11 +78,65 @@ def extra_logging(df):
         logging.info('extra_logging() - datasets in df_%s: %s\n', year, df_20xx.dataset.unique())
 '''
 
+def compact_df(df, categories=[], coordinates=[], counts=[]):
+    # change the columns of `df` (without copying the other ones) to smaller types:
+    # repeated strings as categories, coordinates as `float32` and counts as `int32`
+    for column in categories:
+        if column in df.columns and not is_categorical_dtype(df[column].dtype):
+            df[column] = df[column].astype('category')
+
+    for column in coordinates:
+        if column in df.columns:
+            df[column] = df[column].astype('float32')
+
+    for column in counts:
+        if column in df.columns:
+            df[column] = df[column].astype('int32')
+
+    return df
+
+
+def get_df_with_float64_coordinates(df, coordinates=['longitude', 'latitude']):
+    # the `float32` coordinates are converted to the shortest `float64` that represents them,
+    # then they are shown as e.g. `-23.1887` instead of `-23.188699722290039`
+    return df.assign(**{
+        column: df[column].astype(str).astype('float64')
+        for column in coordinates if df[column].dtype == 'float32'
+    })
+
+
 def filter_df_by(df, group_by=['dataset', 'year_month'], count='scene_id',
                  to_frame='number', sort_by=None, ascending=True):
     # group the df by `group_by` and count how many scenes are
-    df = df.groupby(group_by)[count].count().to_frame(to_frame).reset_index()
+    # `observed=True` returns just the existing groups, instead of all the combinations of the categories
+    df = df.groupby(group_by, observed=True)[count].count().to_frame(to_frame).reset_index()
+
+    return __sort_and_organize_df(df, sort_by=sort_by, ascending=ascending)
+
+
+def update_filtered_df(df, df_added, df_removed, group_by=['dataset', 'year_month'], count='scene_id',
+                       to_frame='number', sort_by=None, ascending=True):
+    # `df` is a result of `filter_df_by`, then instead of grouping all the rows again,
+    # I add the counting of `df_added` rows and I subtract the counting of `df_removed` rows
+    dfs = [df]
 
+    if not df_added.empty:
+        dfs.append(filter_df_by(df_added, group_by=group_by, count=count, to_frame=to_frame))
+
+    if not df_removed.empty:
+        df_removed = filter_df_by(df_removed, group_by=group_by, count=count, to_frame=to_frame)
+        df_removed[to_frame] = -df_removed[to_frame]
+        dfs.append(df_removed)
+
+    df = concat(dfs).groupby(group_by, observed=True)[to_frame].sum().to_frame(to_frame).reset_index()
+
+    # remove the groups that do not have any row anymore
+    df = df[df[to_frame] > 0]
+
+    return __sort_and_organize_df(df, sort_by=sort_by, ascending=ascending)
+
+
+def __sort_and_organize_df(df, sort_by=None, ascending=True):
     # if someone passes `sort_by` parameter, then I sort the values by it
     if sort_by:
         df = df.sort_values(sort_by, ascending=ascending)
@@ -98,9 +159,9 @@ def __get_logical_date_range(df, xaxis_range=None):
 
     # if there are values, then get a boolean df according to the selected date range
     if xaxis_range:
-        # [:-3] - extract the string without the last 3 chars, in other words, I get just the year and month
-        start_date = xaxis_range[0][:-3]
-        end_date = xaxis_range[1][:-3]
+        # the months are compared as numbers of months since the year 0, instead of strings
+        start_date = get_month_ordinal(xaxis_range[0])
+        end_date = get_month_ordinal(xaxis_range[1])
 
         logging.info('__get_logical_date_range() - start_date: %s', start_date)
         logging.info('__get_logical_date_range() - end_date: %s\n', end_date)
@@ -128,22 +189,62 @@ def __get_date_picker_range_message(start_date, end_date):
     return message
 
 
-def __get_figure_of_number_of_downloaded_scenes_time_series(df, x='date', y='number', title='Time Series'):
+# the buttons of the range selector of the time series, `all` shows the whole chart again
+time_series_range_selector_buttons = [
+    dict(count=1, label="1m", step="month", stepmode="backward"),
+    dict(count=6, label="6m", step="month", stepmode="backward"),
+    dict(count=1, label="YTD", step="year", stepmode="todate"),
+    dict(count=1, label="1y", step="year", stepmode="backward"),
+    dict(step="all")
+]
+
+
+def __offset_date(date, step, count):
+    # add `count` months or years to `date` in the same way as plotly.js (i.e. `d3.time.month.utc.offset`),
+    # the days that do not exist in the new month overflow to the next one (e.g. 31/03 - 1 month = 03/03)
+    months = date.month - 1 + (count if step == 'month' else 12 * count)
+
+    return date.replace(year=date.year + months // 12, month=months % 12 + 1, day=1) + timedelta(days=date.day - 1)
+
+
+def get_time_series_range_selector_ranges(end_date):
+    # return the ranges of the x axis that the buttons of the range selector (except `all`) show, by label,
+    # when the time series ends on `end_date`, they are the same ranges that the browser sends on `relayoutData`
+    ranges = {}
+
+    for button in time_series_range_selector_buttons:
+        if button['step'] == 'all':
+            continue
+
+        start_date = __offset_date(end_date, button['step'], -button['count'])
+
+        # `todate` starts on the first day of the month or of the year after the offset (e.g. YTD starts on 01/01)
+        if button['stepmode'] == 'todate':
+            first_date = start_date.replace(day=1) if button['step'] == 'month' else start_date.replace(month=1, day=1)
+
+            if start_date != first_date:
+                start_date = __offset_date(first_date, button['step'], 1)
+
+        ranges[button['label']] = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+
+    return ranges
+
+
+def __get_figure_of_number_of_downloaded_scenes_time_series(df, x='date', y='number', title='Time Series',
+                                                            xaxis_range=None, uirevision=None):
 
     figure_height = 800
 
     fig = px.line(df, x=x, y=y, title=title, height=figure_height)
 
+    # keep the range that the user has zoomed in, while `uirevision` does not change
+    if xaxis_range:
+        fig.update_xaxes(range=xaxis_range)
+
     fig.update_xaxes(
         rangeslider_visible=True,
         rangeselector=dict(
-            buttons=list([
-                dict(count=1, label="1m", step="month", stepmode="backward"),
-                dict(count=6, label="6m", step="month", stepmode="backward"),
-                dict(count=1, label="YTD", step="year", stepmode="todate"),
-                dict(count=1, label="1y", step="year", stepmode="backward"),
-                dict(step="all")
-            ]),
+            buttons=time_series_range_selector_buttons,
             font=dict(color="black"),
             bgcolor=colors['text']
         )
@@ -155,6 +256,7 @@ def __get_figure_of_number_of_downloaded_scenes_time_series(df, x='date', y='num
         font={'color': colors['text']},
         xaxis={'title': 'Date'},
         yaxis={'title': 'Number of Downloaded Scenes'},
+        uirevision=uirevision
     )
 
     return fig
@@ -167,11 +269,16 @@ def __get_figure_of_graph_bubble_map_number_of_scenes(df, sort_by=None, ascendin
     logging.info('get_figure_of_graph_bubble_map_number_of_scenes()')
 
     figure_height = 800
-    df_copy = df.copy()
+    # `assign` creates a copy from the original df
+    df_copy = get_df_with_float64_coordinates(df)
 
     # sort by `sort_by`
     df_copy.sort_values(by=sort_by, ascending=ascending, inplace=True)
 
+    # the months are formatted (e.g. 2020-01) just to be displayed
+    if 'year_month' in df_copy.columns:
+        df_copy['year_month'] = get_year_months(df_copy['year_month'])
+
     logging.info('get_figure_of_graph_bubble_map_number_of_scenes() - df_copy.head(): \n%s\n', df_copy.head())
 
     if plot_type == 'scatter_geo':
@@ -230,3 +337,33 @@ def __get_figure_of_graph_bubble_map_number_of_scenes(df, sort_by=None, ascendin
         raise CatalogDashException('Invalid `plot_type`={}'.format(plot_type))
 
     return fig
+
+
+# building, validating and serializing a figure with Plotly are the slowest steps of the callbacks,
+# then the figures are kept already serialized as JSON and they are sent as they are (see `modules/rawjson.py`)
+figure_cache = LRUCache(
+    'figures', maxsize=FIGURE_CACHE_SIZE, ttl=FIGURE_CACHE_TTL, maxbytes=FIGURE_CACHE_MAX_BYTES
+)
+
+
+def get_cached_figures(key, create_figures):
+    # `key` must contain the figure type, its parameters and the version of the data;
+    # `create_figures()` returns a figure or a list of figures, that are built just if they are not cached,
+    # the concurrent requests of the same figures (e.g. the default date range) wait for a single building
+    def create_figures_as_json():
+        figures = create_figures()
+
+        if isinstance(figures, (list, tuple)):
+            return [RawJSON(dumps(figure, cls=PlotlyJSONEncoder)) for figure in figures]
+
+        return RawJSON(dumps(figures, cls=PlotlyJSONEncoder))
+
+    # the size of the cached figures is the length of their JSON
+    figures = figure_cache.get_or_set(
+        key, create_figures_as_json,
+        size=lambda figures: sum(map(len, figures)) if isinstance(figures, list) else len(figures)
+    )
+
+    logging.info('get_cached_figures() - key: %s - stats: %s\n', key, figure_cache.stats)
+
+    return figures
@@ -0,0 +1,25 @@
+// functions used by the map of the download app
+window.catalogDash = Object.assign({}, window.catalogDash, {
+    download: {
+        point_to_layer: function (feature, latlng, context) {
+            // a point is drawn as before
+            if (!feature.properties.cluster) {
+                return window.dlx.scatter.point_to_layer(feature, latlng, context);
+            }
+
+            // the cluster was created by the server, then its points are not in the browser,
+            // the server sends the mean value of the points, that is used to color the cluster
+            var color_prop = (context.props.hideout && context.props.hideout.color_prop) || 'value';
+            var leaf = {properties: {}};
+            leaf.properties[color_prop] = feature.properties[color_prop];
+
+            var index = {
+                getLeaves: function () {
+                    return [leaf];
+                }
+            };
+
+            return window.dlx.scatter.cluster_to_layer(feature, latlng, index, context);
+        }
+    }
+});
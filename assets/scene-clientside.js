@@ -0,0 +1,129 @@
+// clientside callbacks of the scene app, they are used if `IS_TO_USE_CLIENTSIDE_FILTERING` is enabled
+(function () {
+    function get_month_ordinal(date) {
+        // convert a 'YYYY-MM[-DD...]' string to the number of months since the year 0
+        return parseInt(date.slice(0, 4), 10) * 12 + parseInt(date.slice(5, 7), 10) - 1;
+    }
+
+    function get_year_month(month_ordinal) {
+        // convert a number of months since the year 0 to a 'YYYY-MM' string
+        var year = String(Math.floor(month_ordinal / 12));
+        var month = String(month_ordinal % 12 + 1);
+
+        return '0000'.slice(year.length) + year + '-' + (month.length < 2 ? '0' : '') + month;
+    }
+
+    function copy(object) {
+        return JSON.parse(JSON.stringify(object));
+    }
+
+    function get_bar_plot(cube, start_month, end_month) {
+        // the template has one empty bar by dataset, in the order of the datasets
+        var figure = copy(cube.figures[0]);
+        var rows = cube.bar;
+
+        for (var i = 0; i < rows.number.length; i++) {
+            var month = rows.year_month[i];
+
+            if (month < start_month || month > end_month || rows.dataset[i] < 0) {
+                continue;
+            }
+
+            var trace = figure.data[rows.dataset[i]];
+            var year_month = get_year_month(month);
+            var number = rows.number[i];
+
+            trace.x.push(year_month);
+            trace.y.push(number);
+            trace.text.push(number);
+            trace.hovertext.push(
+                'Number of Scenes: ' + number + '<br>' +
+                'Period: ' + year_month + '<br>' +
+                'Dataset: ' + cube.datasets[rows.dataset[i]]
+            );
+        }
+
+        return figure;
+    }
+
+    function get_bubble_map(cube, start_month, end_month) {
+        // the template has one trace, that is copied to each dataset with points in the range
+        var figure = copy(cube.figures[1]);
+        var prototype = figure.data[0];
+        var rows = cube.map;
+
+        figure.data = [];
+
+        if (prototype === undefined) {
+            return figure;
+        }
+
+        // the colors are given to the datasets in the order that they appear, as Plotly Express does
+        var colorway = figure.layout.template.layout.colorway;
+        var traces = {};
+        var max_number = 0;
+
+        // the rows are sorted by month and dataset
+        for (var i = 0; i < rows.number.length; i++) {
+            var month = rows.year_month[i];
+
+            if (month < start_month || month > end_month) {
+                continue;
+            }
+
+            var dataset = cube.datasets[rows.dataset[i]];
+            var trace = traces[dataset];
+
+            if (trace === undefined) {
+                trace = copy(prototype);
+
+                trace.name = dataset;
+                trace.legendgroup = dataset;
+                trace.hovertemplate = prototype.hovertemplate.replace('dataset=' + prototype.name, 'dataset=' + dataset);
+                trace.marker.color = colorway[figure.data.length % colorway.length];
+                trace.lon = [];
+                trace.lat = [];
+                trace.marker.size = [];
+                trace.customdata = [];
+
+                traces[dataset] = trace;
+                figure.data.push(trace);
+            }
+
+            var location = rows.location[i];
+            var number = rows.number[i];
+
+            trace.lon.push(cube.locations.longitude[location]);
+            trace.lat.push(cube.locations.latitude[location]);
+            trace.marker.size.push(number);
+            trace.customdata.push([get_year_month(month)]);
+
+            max_number = Math.max(max_number, number);
+        }
+
+        // the size of the bubbles is relative to the greatest number in the range (i.e. `size_max` equals 20)
+        figure.data.forEach(function (trace) {
+            trace.marker.sizeref = max_number / (20 * 20);
+        });
+
+        return figure;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        scene: {
+            update_figures: function (start_date, end_date, cube) {
+                if (!start_date || !end_date || !cube) {
+                    return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+                }
+
+                var start_month = get_month_ordinal(start_date);
+                var end_month = get_month_ordinal(end_date);
+
+                return [
+                    get_bar_plot(cube, start_month, end_month),
+                    get_bubble_map(cube, start_month, end_month)
+                ];
+            }
+        }
+    });
+})();
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+"""Micro-benchmarks of the services of the apps with synthetic data.
+
+Run `python -m benchmarks --help` to see the options and `python -m benchmarks.compare` to compare two runs.
+"""
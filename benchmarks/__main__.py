@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+"""Time the services of the apps with synthetic data of several sizes and save the timings as JSON.
+
+e.g. `python -m benchmarks --sizes 10000 100000 1000000 --output before.json`, then change the code,
+run it again with `--output after.json` and compare both runs with `python -m benchmarks.compare before.json after.json`.
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from gc import collect
+from json import dump
+from logging import INFO, disable
+from os import cpu_count, environ
+from os.path import abspath, dirname, join
+from platform import platform, python_version
+from statistics import mean, median
+from subprocess import PIPE, run
+from sys import executable, modules as sys_modules, path as sys_path
+from time import perf_counter
+from types import ModuleType
+
+from dateutil.relativedelta import relativedelta
+
+from benchmarks.generators import generate_dash_download_nofbs, generate_scene_dataset
+
+
+root_directory = dirname(dirname(abspath(__file__)))
+
+# the modules whose import is timed, each one in a new process, `main` also loads the data of the apps
+# (i.e. it needs the CSV file, the database or a snapshot)
+imported_modules = ['pandas', 'plotly.express', 'dash', 'dash_table', 'dash_leaflet', 'modules.table', 'main']
+
+
+##################################################
+# services
+##################################################
+
+def __import_services():
+    # the benchmarks measure the data in memory, then the pushdown to the database is disabled
+    environ['IS_TO_USE_DATA_FROM_DB'] = 'False'
+    environ['IS_TO_USE_SQL_PUSHDOWN'] = 'False'
+
+    if root_directory not in sys_path:
+        sys_path.insert(0, root_directory)
+
+    # the packages of the apps load the data and register the callbacks when they are imported,
+    # then they are registered as empty packages and just their service modules are imported
+    for package in ('apps', 'apps.scene', 'apps.download'):
+        if package not in sys_modules:
+            module = ModuleType(package)
+            module.__path__ = [join(root_directory, *package.split('.'))]
+            sys_modules[package] = module
+
+    from apps import service
+    from apps.download import service as download_service
+    from apps.scene import service as scene_service
+
+    # the services log each call, it would be timed too
+    disable(INFO)
+
+    return service, scene_service, download_service
+
+
+##################################################
+# timer
+##################################################
+
+def __time(function, setup=None, repeat=5, max_seconds=10.0):
+    # return the duration (in seconds) of each call, `setup` creates the argument of each call out of the timing,
+    # the slow functions are called less times, until `max_seconds` (but at least once)
+    timings = []
+
+    for _ in range(repeat):
+        arguments = (setup(),) if setup else ()
+
+        collect()
+
+        start = perf_counter()
+        function(*arguments)
+        timings.append(perf_counter() - start)
+
+        if sum(timings) >= max_seconds:
+            break
+
+    return timings
+
+
+def __get_result(group, name, rows, timings):
+    return {
+        'group': group,
+        'name': name,
+        'rows': rows,
+        'runs': len(timings),
+        'min': min(timings),
+        'median': median(timings),
+        'mean': mean(timings),
+        'max': max(timings)
+    }
+
+
+def __run_benchmarks(group, rows, benchmarks, repeat, max_seconds):
+    # `benchmarks` is a list of (name, function, setup)
+    results = []
+
+    for name, function, setup in benchmarks:
+        try:
+            result = __get_result(group, name, rows, __time(function, setup, repeat, max_seconds))
+        # a benchmark that fails (e.g. out of memory) does not stop the other ones
+        except Exception as error:
+            result = {'group': group, 'name': name, 'rows': rows, 'error': repr(error)}
+
+        __print_result(result)
+        results.append(result)
+
+    return results
+
+
+##################################################
+# benchmarks
+##################################################
+
+def __get_scene_benchmarks(service, scene_service, df):
+    compact_df = getattr(scene_service, '__compact_df')
+    bubble_map = getattr(service, '__get_figure_of_graph_bubble_map_number_of_scenes')
+
+    df_compacted = compact_df(df.copy())
+    df_organized = scene_service.copy_and_organize_df(df_compacted)
+    data = scene_service.create_scene_data(df_compacted)
+
+    min_start_date = data['min_start_date']
+
+    # the default range of the page (i.e. the first month) and the whole range
+    xaxis_ranges = {
+        'month': [str(min_start_date), str(min_start_date + relativedelta(months=1))],
+        'all': [str(min_start_date), str(data['max_end_date'])]
+    }
+
+    benchmarks = [
+        ('compact_df', compact_df, lambda: df.copy()),
+        ('copy_and_organize_df', lambda: scene_service.copy_and_organize_df(df_compacted), None),
+        ('filter_df_by[dataset, year_month]', lambda: service.filter_df_by(df_organized), None),
+        ('filter_df_by[dataset, year_month, longitude, latitude]', lambda: service.filter_df_by(
+            df_organized, group_by=['dataset', 'year_month', 'longitude', 'latitude']
+        ), None),
+        ('create_scene_data', lambda: scene_service.create_scene_data(df_compacted), None)
+    ]
+
+    for range_name, xaxis_range in xaxis_ranges.items():
+        df_bar, df_map = scene_service.get_sub_dfs_based_on_date_range(data, xaxis_range)
+
+        benchmarks += [
+            ('get_sub_dfs_based_on_date_range[{}]'.format(range_name),
+             lambda xaxis_range=xaxis_range: scene_service.get_sub_dfs_based_on_date_range(data, xaxis_range), None),
+            # the figures are built with the same parameters of the callback
+            ('get_figure_of_graph_bar_plot_number_of_scenes[{}]'.format(range_name),
+             lambda df_bar=df_bar, xaxis_range=xaxis_range: scene_service.get_figure_of_graph_bar_plot_number_of_scenes(
+                 df_bar, xaxis_range=xaxis_range, title=scene_service.bar_plot_title,
+                 datasets=data['cube_dataset_year_month'].keys['dataset']
+             ), None),
+            ('__get_figure_of_graph_bubble_map_number_of_scenes[{}]'.format(range_name),
+             lambda df_map=df_map: bubble_map(
+                 df_map, sort_by=['year_month', 'dataset'], title=scene_service.bubble_map_title,
+                 color='dataset', hover_data=['year_month']
+             ), None)
+        ]
+
+    return benchmarks
+
+
+def __get_download_benchmarks(service, download_service, df):
+    compact_df = getattr(download_service, '__compact_df')
+    create_sub_df = getattr(download_service, '__create_sub_df_based_on_parameters')
+    create_sub_dfs = getattr(download_service, '__create_sub_dfs_based_on_parameters')
+    get_geojson_data = getattr(download_service, '__get_geojson_data')
+    get_clustered_geojson_data = getattr(download_service, '__get_clustered_geojson_data')
+    time_series = getattr(service, '__get_figure_of_number_of_downloaded_scenes_time_series')
+
+    df_compacted = compact_df(df.copy())
+    data = download_service.create_download_data(df_compacted)
+    df_d_base = data['df_d_base']
+
+    min_start_date = data['min_start_date']
+
+    # the default parameters of the page (i.e. the first week and 100 rows) and all the rows
+    parameters = {
+        'week': (min_start_date, min_start_date + timedelta(days=7), 100),
+        'all': (min_start_date, data['max_end_date'], 0)
+    }
+
+    benchmarks = [
+        ('compact_df', compact_df, lambda: df.copy()),
+        ('create_download_data', lambda: download_service.create_download_data(df_compacted), None)
+    ]
+
+    for name, (start_date, end_date, limit) in parameters.items():
+        sub_dfs = create_sub_dfs(df_d_base, start_date, end_date, limit)
+
+        benchmarks += [
+            ('__create_sub_df_based_on_parameters[{}]'.format(name),
+             lambda start_date=start_date, end_date=end_date, limit=limit: create_sub_df(
+                 df_d_base, start_date, end_date, limit
+             ), None),
+            ('__create_sub_dfs_based_on_parameters[{}]'.format(name),
+             lambda start_date=start_date, end_date=end_date, limit=limit: create_sub_dfs(
+                 df_d_base, start_date, end_date, limit
+             ), None),
+            ('__get_geojson_data[{}]'.format(name),
+             lambda sub_dfs=sub_dfs: get_geojson_data(sub_dfs['sub_df_d_base']), None),
+            # the default view of the map
+            ('__get_clustered_geojson_data[{}]'.format(name),
+             lambda sub_dfs=sub_dfs: get_clustered_geojson_data(sub_dfs, (-15.0, -55.0), 5), None),
+            ('__get_figure_of_number_of_downloaded_scenes_time_series[{}]'.format(name),
+             lambda sub_dfs=sub_dfs: time_series(
+                 sub_dfs['sub_df_ndsb_date'], x='date', y='number',
+                 title='Number of downloaded scenes by date', uirevision='benchmark'
+             ), None)
+        ]
+
+    return benchmarks
+
+
+def __get_import_results(repeat):
+    # each module is imported by a new process, then the modules that were imported before are not reused
+    results = []
+
+    for module in imported_modules:
+        code = 'from time import perf_counter; start = perf_counter(); import {}; print(perf_counter() - start)'.format(
+            module
+        )
+
+        timings = []
+        error = None
+
+        for _ in range(repeat):
+            process = run([executable, '-c', code], cwd=root_directory, stdout=PIPE, stderr=PIPE,
+                          universal_newlines=True)
+
+            if process.returncode != 0:
+                # the last line of the traceback, e.g. a missing file or database
+                lines = process.stderr.strip().splitlines()
+                error = lines[-1] if lines else 'exit code {}'.format(process.returncode)
+                break
+
+            timings.append(float(process.stdout.strip().splitlines()[-1]))
+
+        if error is None:
+            result = __get_result('import', module, None, timings)
+        else:
+            result = {'group': 'import', 'name': module, 'rows': None, 'error': error}
+
+        __print_result(result)
+        results.append(result)
+
+    return results
+
+
+##################################################
+# output
+##################################################
+
+def __print_result(result):
+    rows = '' if result['rows'] is None else result['rows']
+
+    if 'error' in result:
+        print('{:<9} {:<60} {:>10}   error: {}'.format(result['group'], result['name'], rows, result['error']))
+    else:
+        print('{:<9} {:<60} {:>10} {:>12.6f} {:>12.6f}   ({} runs)'.format(
+            result['group'], result['name'], rows, result['min'], result['median'], result['runs']
+        ), flush=True)
+
+
+def __get_git_commit():
+    try:
+        process = run(['git', 'rev-parse', 'HEAD'], cwd=root_directory, stdout=PIPE, stderr=PIPE,
+                      universal_newlines=True)
+        return process.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def __get_metadata(arguments):
+    import dash
+    import numpy
+    import pandas
+    import plotly
+
+    from modules import environment
+
+    return {
+        'date': datetime.now().isoformat(),
+        'commit': __get_git_commit(),
+        'python': python_version(),
+        'platform': platform(),
+        'cpu_count': cpu_count(),
+        'versions': {
+            'dash': dash.__version__,
+            'numpy': numpy.__version__,
+            'pandas': pandas.__version__,
+            'plotly': plotly.__version__
+        },
+        # the options that change the benchmarked functions
+        'environment': {
+            name: getattr(environment, name)
+            for name in ('IS_TO_USE_CLIENTSIDE_FILTERING', 'IS_TO_USE_GEOBUF', 'TIME_SERIES_MAX_POINTS')
+        },
+        'sizes': arguments.sizes,
+        'repeat': arguments.repeat,
+        'max_seconds': arguments.max_seconds,
+        'seed': arguments.seed
+    }
+
+
+def main():
+    parser = ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10 ** 4, 10 ** 5, 10 ** 6],
+                        help='number of rows of the synthetic dataframes (10^7 or more rows need several GB of memory)')
+    parser.add_argument('--groups', nargs='+', choices=['scene', 'download', 'import'],
+                        default=['scene', 'download', 'import'], help='benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=5, help='maximum number of runs of each benchmark')
+    parser.add_argument('--max-seconds', type=float, default=10.0,
+                        help='a benchmark is not run again after this number of seconds')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    parser.add_argument('--output', help='JSON file where the timings are saved')
+    arguments = parser.parse_args()
+
+    service, scene_service, download_service = __import_services()
+
+    results = []
+
+    print('{:<9} {:<60} {:>10} {:>12} {:>12}'.format('group', 'name', 'rows', 'min (s)', 'median (s)'))
+
+    # the data of each size is released before creating the next one
+    for rows in arguments.sizes:
+        if 'scene' in arguments.groups:
+            results += __run_benchmarks('scene', rows, __get_scene_benchmarks(
+                service, scene_service, generate_scene_dataset(rows, seed=arguments.seed)
+            ), arguments.repeat, arguments.max_seconds)
+
+        if 'download' in arguments.groups:
+            results += __run_benchmarks('download', rows, __get_download_benchmarks(
+                service, download_service, generate_dash_download_nofbs(rows, seed=arguments.seed)
+            ), arguments.repeat, arguments.max_seconds)
+
+        collect()
+
+    if 'import' in arguments.groups:
+        results += __get_import_results(arguments.repeat)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            dump({'metadata': __get_metadata(arguments), 'results': results}, file, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
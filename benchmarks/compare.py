@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""Compare two runs of the benchmarks (i.e. JSON files saved by `python -m benchmarks --output`).
+
+e.g. `python -m benchmarks.compare before.json after.json`, the ratio is the median of the second run
+divided by the median of the first one, then a ratio less than 1 means that the second run is faster.
+"""
+
+from argparse import ArgumentParser
+from json import load
+
+
+def __read_results(path):
+    # return a dict of (group, name, rows) -> result
+    with open(path) as file:
+        results = load(file)['results']
+
+    return {(result['group'], result['name'], result['rows']): result for result in results}
+
+
+def __format_median(result):
+    if result is None:
+        return '-'
+    if 'error' in result:
+        return 'error'
+
+    return '{:.6f}'.format(result['median'])
+
+
+def main():
+    parser = ArgumentParser(prog='python -m benchmarks.compare', description=__doc__.split('\n')[0])
+    parser.add_argument('before', help='JSON file of the first run')
+    parser.add_argument('after', help='JSON file of the second run')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='a relative change greater than it is marked as faster or slower (default: 0.1, i.e. 10%%)')
+    arguments = parser.parse_args()
+
+    before = __read_results(arguments.before)
+    after = __read_results(arguments.after)
+
+    print('{:<9} {:<60} {:>10} {:>12} {:>12} {:>8}'.format('group', 'name', 'rows', 'before (s)', 'after (s)', 'ratio'))
+
+    # the benchmarks of the first run, followed by the new ones of the second run
+    for key in list(before) + [key for key in after if key not in before]:
+        group, name, rows = key
+        result_before, result_after = before.get(key), after.get(key)
+
+        ratio, mark = '', ''
+
+        if result_before and result_after and 'median' in result_before and 'median' in result_after:
+            ratio = result_after['median'] / result_before['median'] if result_before['median'] else float('inf')
+
+            if ratio > 1 + arguments.threshold:
+                mark = 'slower'
+            elif ratio < 1 - arguments.threshold:
+                mark = 'faster'
+
+            ratio = '{:.2f}'.format(ratio)
+
+        print('{:<9} {:<60} {:>10} {:>12} {:>12} {:>8}   {}'.format(
+            group, name, '' if rows is None else rows,
+            __format_median(result_before), __format_median(result_after), ratio, mark
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""Synthetic `scene_dataset` and `dash_download_nofbs` dataframes, with the same columns and types
+that the apps read from the CSV file and the database (i.e. before being compacted).
+"""
+
+from numpy import arange, char, datetime64, float64, timedelta64
+from numpy.random import default_rng
+from pandas import DataFrame, Series
+
+
+# the datasets of the catalog, each one has a different number of scenes
+datasets = [
+    'CBERS4A_MUX_L2_DN', 'CBERS4A_WFI_L2_DN', 'CBERS4A_WFI_L4_DN', 'CBERS4A_WPM_L2_DN',
+    'CBERS4_AWFI_L2_DN', 'CBERS4_AWFI_L4_DN', 'CBERS4_AWFI_L4_SR', 'CBERS4_MUX_L2_DN',
+    'CBERS4_MUX_L4_DN', 'CBERS4_PAN10M_L2_DN', 'CBERS4_PAN5M_L2_DN', 'LANDSAT8_OLI_L1_DN', 'LANDSAT7_ETM_L1_DN'
+]
+
+
+def __get_dates(rng, rows, first_date, number_of_days):
+    return datetime64(first_date, 'ns') + rng.integers(0, number_of_days, rows) * timedelta64(1, 'D')
+
+
+def __get_locations(rng, rows):
+    # the centers of the cells of one degree over Brazil (e.g. -52.5, -25.5), as in the real catalog
+    longitude = rng.integers(-75, -34, rows) + 0.5
+    latitude = rng.integers(-34, 6, rows) + 0.5
+
+    return longitude.astype(float64), latitude.astype(float64)
+
+
+def __get_strings(prefix, numbers, suffix=''):
+    # e.g. `prefix` + '123' + `suffix`, built by NumPy instead of a Python loop
+    return Series(char.add(char.add(prefix, numbers.astype(str)), suffix), dtype=object)
+
+
+def generate_scene_dataset(rows, seed=0):
+    # columns: scene_id, dataset, date, longitude, latitude
+    rng = default_rng(seed)
+
+    # some datasets have much more scenes than the other ones
+    weights = 1.0 / arange(1, len(datasets) + 1)
+    dataset_codes = rng.choice(len(datasets), rows, p=weights / weights.sum())
+
+    longitude, latitude = __get_locations(rng, rows)
+
+    return DataFrame({
+        'scene_id': __get_strings('SCENE', arange(rows)),
+        'dataset': Series(datasets, dtype=object).values[dataset_codes],
+        # about 5 years of scenes
+        'date': __get_dates(rng, rows, '2016-05-01', 5 * 365),
+        'longitude': longitude,
+        'latitude': latitude
+    })
+
+
+def generate_dash_download_nofbs(rows, seed=0):
+    # columns: scene_id, nofbs, user_id, name, date, longitude, latitude
+    rng = default_rng(seed)
+
+    # the number of users grows with the number of downloads
+    users = rng.integers(0, max(rows // 1000, 50), rows)
+
+    longitude, latitude = __get_locations(rng, rows)
+
+    return DataFrame({
+        'scene_id': __get_strings('SCENE', rng.integers(0, max(rows // 4, 1), rows)),
+        # number of downloaded assets by scene
+        'nofbs': rng.integers(1, 5, rows),
+        'user_id': __get_strings('user', users, '@example.com'),
+        'name': __get_strings('User ', users),
+        # about 2 years of downloads
+        'date': __get_dates(rng, rows, '2019-01-01', 2 * 365),
+        'longitude': longitude,
+        'latitude': latitude
+    })
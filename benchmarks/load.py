@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+
+"""Load test of the callbacks: several concurrent users open the pages and change the date ranges and the limits.
+
+Each user sends the same requests as the browser to `/_dash-update-component` (i.e. the page load,
+the callbacks fired by the new page and the callbacks fired by each change), then the latency percentiles,
+the throughput and the size of the responses are reported by callback.
+
+As a browser, the users accept gzip, then the reported sizes are the compressed ones. Each response is decoded
+and the invalid ones (e.g. that are not JSON or that still have a placeholder of `modules/rawjson.py`) are errors.
+
+By default, the application runs in this process through the test client of Flask, with the scenes of the CSV file
+and synthetic downloads saved as a CSV file (see `DOWNLOAD_CSV_FILE`), then it does not need the database.
+With `--url`, the requests are sent to a running server instead (e.g. gunicorn, with several workers).
+
+e.g. `python -m benchmarks.load --users 10 --interactions 20 --record sessions.json`, then the same requests
+can be sent again to another version of the application with `--replay sessions.json`.
+"""
+
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from gzip import decompress
+from json import dump, dumps, load, loads
+from logging import INFO, disable
+from math import ceil
+from os import chdir, environ
+from os.path import abspath, dirname, join
+from random import Random
+from statistics import mean
+from sys import path as sys_path
+from tempfile import mkdtemp
+from threading import Barrier, Lock, Thread
+from time import perf_counter, sleep
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from uuid import UUID
+
+
+root_directory = dirname(dirname(abspath(__file__)))
+
+# the values that the users choose for the inputs of type number (i.e. the limit, 0 shows all)
+limits = [10, 100, 1000, 0]
+# number of days of the date ranges that the users choose
+date_range_lengths = [7, 30, 90, 365, 3 * 365]
+# the users accept compressed responses, as the browsers do
+request_headers = {'Accept-Encoding': 'gzip'}
+
+
+##################################################
+# transport
+##################################################
+
+def __get_response(status, headers, data):
+    # return the status, the decoded body and the number of bytes that have been sent
+    size = len(data)
+
+    if headers.get('Content-Encoding') == 'gzip':
+        data = decompress(data)
+
+    return status, data, size
+
+
+def __get_test_client_transport(download_rows, seed):
+    # run the application in this process, without the database
+    if root_directory not in sys_path:
+        sys_path.insert(0, root_directory)
+
+    environ['IS_TO_USE_DATA_FROM_DB'] = 'False'
+    environ['IS_TO_USE_SQL_PUSHDOWN'] = 'False'
+
+    if not environ.get('DOWNLOAD_CSV_FILE'):
+        from benchmarks.generators import generate_dash_download_nofbs
+
+        environ['DOWNLOAD_CSV_FILE'] = join(mkdtemp(prefix='catalog-dash-load-'), 'dash_download_nofbs.csv')
+        generate_dash_download_nofbs(download_rows, seed=seed).to_csv(environ['DOWNLOAD_CSV_FILE'], index=False)
+
+    # the paths of the application (e.g. `data/scene_dataset.csv`) are relative to the root directory
+    chdir(root_directory)
+
+    # each request logs its parameters, it would be measured too
+    disable(INFO)
+
+    from app import url_base_pathname
+    from main import app
+
+    server = app.server
+
+    def get_client():
+        # each user has its own client, as each browser has its own connection
+        client = server.test_client()
+
+        def send(path, body=None):
+            if body is None:
+                response = client.get(url_base_pathname + path, headers=request_headers)
+            else:
+                response = client.post(url_base_pathname + path, data=dumps(body), content_type='application/json',
+                                       headers=request_headers)
+
+            return __get_response(response.status_code, response.headers, response.get_data())
+
+        return send
+
+    return get_client
+
+
+def __get_url_transport(url):
+    # send the requests to a running server, `url` includes the base path (e.g. http://localhost:8050/catalog-dash)
+    url = url.rstrip('/')
+
+    def get_client():
+        def send(path, body=None):
+            data = None if body is None else dumps(body).encode('utf-8')
+            request = Request(url + path, data=data, headers={'Content-Type': 'application/json', **request_headers})
+
+            try:
+                with urlopen(request) as response:
+                    return __get_response(response.status, response.headers, response.read())
+            except HTTPError as error:
+                return __get_response(error.code, error.headers, error.read())
+
+        return send
+
+    return get_client
+
+
+##################################################
+# page
+##################################################
+
+def __get_components(node, components):
+    # return a dict of id -> component (i.e. its type and props) of the layout as it is serialized to the browser
+    if isinstance(node, list):
+        for item in node:
+            __get_components(item, components)
+    elif isinstance(node, dict):
+        if 'props' in node and 'type' in node:
+            if 'id' in node['props']:
+                components[node['props']['id']] = node
+
+            for value in node['props'].values():
+                __get_components(value, components)
+        else:
+            for value in node.values():
+                __get_components(value, components)
+
+    return components
+
+
+def __get_outputs(output):
+    # e.g. `a.b` or `..a.b...c.d..` (i.e. several outputs)
+    if output.startswith('..'):
+        return [tuple(item.rsplit('.', 1)) for item in output[2:-2].split('...')]
+
+    return [tuple(output.rsplit('.', 1))]
+
+
+def __get_payload(callback, props, changed_props):
+    # the request that the browser sends when `changed_props` (a list of `id.prop`) fire the callback
+    outputs = [{'id': id, 'property': prop} for id, prop in __get_outputs(callback['output'])]
+
+    def get_values(items):
+        return [
+            {'id': item['id'], 'property': item['property'], 'value': props.get(item['id'], {}).get(item['property'])}
+            for item in items
+        ]
+
+    return {
+        'output': callback['output'],
+        'outputs': outputs if len(outputs) > 1 else outputs[0],
+        'inputs': get_values(callback['inputs']),
+        'state': get_values(callback['state']),
+        'changedPropIds': changed_props
+    }
+
+
+def __load_page(pathname, callbacks, layout):
+    # return the components and callbacks of a page, it is loaded once and then each user creates its own session
+    components = __get_components(layout, {})
+
+    return {
+        'pathname': pathname,
+        'components': components,
+        # the callbacks whose inputs are all in the page, the clientside ones are not sent to the server
+        'callbacks': [
+            callback for callback in callbacks
+            if not callback.get('clientside_function') and callback['inputs'] and
+            all(item['id'] in components for item in callback['inputs'])
+        ]
+    }
+
+
+def __get_change(page, rng):
+    # return a random change of the page as a dict of id -> {prop: value}, as an user does
+    changes = []
+
+    for id, component in page['components'].items():
+        props = component['props']
+
+        if component['type'] == 'DatePickerRange' and props.get('min_date_allowed') and props.get('max_date_allowed'):
+            min_date = date.fromisoformat(props['min_date_allowed'][:10])
+            max_date = date.fromisoformat(props['max_date_allowed'][:10])
+
+            start_date = min_date + timedelta(days=rng.randint(0, max((max_date - min_date).days, 0)))
+            end_date = min(start_date + timedelta(days=rng.choice(date_range_lengths)), max_date)
+
+            changes.append({id: {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}})
+
+        elif component['type'] == 'Input' and props.get('type') == 'number':
+            changes.append({id: {'value': rng.choice(limits)}})
+
+    return rng.choice(changes) if changes else {}
+
+
+def __create_session(page, callbacks_of_index, rng, interactions):
+    # return the requests of an user, i.e. a list of dicts with the callback and the payload
+    pathname_props = {'url': {'pathname': page['pathname']}}
+
+    # the page is loaded by the callback of `main.py`, then the page fires all its callbacks
+    requests = [
+        {'callback': callback['output'], 'payload': __get_payload(callback, pathname_props, ['url.pathname'])}
+        for callback in callbacks_of_index
+    ]
+
+    props = {id: dict(component['props']) for id, component in page['components'].items()}
+
+    # the page is loaded once for all the users, then each user receives its own session id, as if it had
+    # loaded the page, otherwise the requests of the other users would be abandoned as superseded
+    for id, component in page['components'].items():
+        if component['type'] == 'Store' and id.endswith('--session-id'):
+            props[id]['data'] = UUID(int=rng.getrandbits(128), version=4).hex
+
+    for callback in page['callbacks']:
+        requests.append({'callback': callback['output'], 'payload': __get_payload(callback, props, [])})
+
+    for _ in range(interactions):
+        changed_props = []
+
+        for id, values in __get_change(page, rng).items():
+            props[id].update(values)
+            changed_props += ['{}.{}'.format(id, prop) for prop in values]
+
+        # just the callbacks whose inputs have changed are fired, the chained callbacks (i.e. fired by
+        # the outputs of other callbacks) are not fired again
+        for callback in page['callbacks']:
+            if any('{}.{}'.format(item['id'], item['property']) in changed_props for item in callback['inputs']):
+                requests.append({
+                    'callback': callback['output'], 'payload': __get_payload(callback, props, changed_props)
+                })
+
+    return requests
+
+
+def __create_sessions(send, pages, users, interactions, seed):
+    # return a list of sessions (i.e. the requests of each user)
+    status, response, _ = send('/_dash-dependencies')
+
+    if status != 200:
+        raise Exception('The callbacks can not be read, status code: {}'.format(status))
+
+    callbacks = loads(response)
+    # the callback that loads the pages (i.e. `display_page`)
+    callbacks_of_index = [
+        callback for callback in callbacks
+        if any(item['id'] == 'url' and item['property'] == 'pathname' for item in callback['inputs'])
+    ]
+
+    loaded_pages = []
+
+    for pathname in pages:
+        status, response, _ = send('/_dash-update-component', __get_payload(
+            callbacks_of_index[0], {'url': {'pathname': pathname}}, ['url.pathname']
+        ))
+
+        if status != 200:
+            raise Exception('The page `{}` can not be loaded, status code: {}'.format(pathname, status))
+
+        loaded_pages.append(__load_page(pathname, callbacks, loads(response)))
+
+    rng = Random(seed)
+
+    # the users are distributed among the pages
+    return [
+        __create_session(loaded_pages[user % len(loaded_pages)], callbacks_of_index, rng, interactions)
+        for user in range(users)
+    ]
+
+
+##################################################
+# load test
+##################################################
+
+def __is_valid_response(status, response):
+    # a callback returns JSON, and its cached values (see `modules/rawjson.py`) must have been inserted in it;
+    # `204` means that the callback has prevented the update (i.e. `PreventUpdate`) and it has no body
+    if status != 200:
+        return True
+
+    try:
+        loads(response)
+    except ValueError:
+        return False
+
+    return b'"raw-json:' not in response
+
+
+def __run_sessions(get_client, sessions, users, think_time):
+    # each user sends the requests of its sessions in order, while the other users do the same
+    samples = []
+    samples_lock = Lock()
+    barrier = Barrier(users)
+
+    def run_user(user):
+        send = get_client()
+        user_samples = []
+
+        barrier.wait()
+
+        for session in sessions[user::users]:
+            for request in session:
+                start = perf_counter()
+                status, response, size = send('/_dash-update-component', request['payload'])
+                duration = perf_counter() - start
+
+                user_samples.append(
+                    (request['callback'], status, duration, size, __is_valid_response(status, response))
+                )
+
+                if think_time:
+                    sleep(think_time)
+
+        with samples_lock:
+            samples.extend(user_samples)
+
+    threads = [Thread(target=run_user, args=(user,)) for user in range(users)]
+
+    start = perf_counter()
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return samples, perf_counter() - start
+
+
+def __get_percentile(sorted_values, percentile):
+    # nearest-rank percentile
+    return sorted_values[max(ceil(percentile / 100 * len(sorted_values)) - 1, 0)]
+
+
+def __get_statistics(samples):
+    latencies = sorted(sample[2] for sample in samples)
+    sizes = [sample[3] for sample in samples]
+
+    return {
+        'requests': len(samples),
+        # `204` means that the callback has prevented the update (i.e. `PreventUpdate`)
+        'errors': sum(1 for sample in samples if sample[1] >= 400 or not sample[4]),
+        'p50': __get_percentile(latencies, 50),
+        'p95': __get_percentile(latencies, 95),
+        'p99': __get_percentile(latencies, 99),
+        'max': latencies[-1],
+        'mean_bytes': mean(sizes),
+        'max_bytes': max(sizes)
+    }
+
+
+def __get_report(samples, duration):
+    callbacks = {}
+
+    for sample in samples:
+        callbacks.setdefault(sample[0], []).append(sample)
+
+    return {
+        'duration': duration,
+        'throughput': len(samples) / duration if duration else 0,
+        'total': __get_statistics(samples) if samples else None,
+        'callbacks': {callback: __get_statistics(items) for callback, items in sorted(callbacks.items())}
+    }
+
+
+def __print_report(report):
+    line = '{:<90} {:>8} {:>6} {:>9} {:>9} {:>9} {:>11}'
+
+    print(line.format('callback', 'requests', 'errors', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'mean bytes'))
+
+    for callback, statistics in list(report['callbacks'].items()) + [('total', report['total'])]:
+        if statistics is None:
+            continue
+
+        print(line.format(
+            callback[:90], statistics['requests'], statistics['errors'],
+            *['{:.1f}'.format(statistics[key] * 1000) for key in ('p50', 'p95', 'p99')],
+            '{:.0f}'.format(statistics['mean_bytes'])
+        ))
+
+    print('\nduration: {:.2f} s - throughput: {:.1f} requests/s'.format(report['duration'], report['throughput']))
+
+
+def main():
+    parser = ArgumentParser(prog='python -m benchmarks.load', description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=10, help='number of concurrent users')
+    parser.add_argument('--interactions', type=int, default=10, help='number of changes of the page by user')
+    parser.add_argument('--pages', nargs='+', default=['scene', 'download'], help='pages opened by the users')
+    parser.add_argument('--think-time', type=float, default=0.0, help='seconds between two requests of an user')
+    parser.add_argument('--url', help='base URL of a running server (e.g. http://localhost:8050/catalog-dash), '
+                                      'instead of the application in this process')
+    parser.add_argument('--download-rows', type=int, default=100000,
+                        help='number of synthetic downloads, if `DOWNLOAD_CSV_FILE` is not informed (without `--url`)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data and of the users')
+    parser.add_argument('--record', help='JSON file where the requests of the users are saved')
+    parser.add_argument('--replay', help='JSON file with the requests saved by `--record`, instead of new ones')
+    parser.add_argument('--output', help='JSON file where the report is saved')
+    arguments = parser.parse_args()
+
+    if arguments.url:
+        get_client = __get_url_transport(arguments.url)
+        base_pathname = '/' + arguments.url.split('://', 1)[-1].partition('/')[2].strip('/')
+    else:
+        get_client = __get_test_client_transport(arguments.download_rows, arguments.seed)
+        from app import url_base_pathname
+        base_pathname = url_base_pathname
+
+    if arguments.replay:
+        with open(arguments.replay) as file:
+            sessions = load(file)
+    else:
+        pages = ['{}/{}'.format(base_pathname.rstrip('/'), page) for page in arguments.pages]
+        sessions = __create_sessions(
+            get_client(), pages, arguments.users, arguments.interactions, arguments.seed
+        )
+
+    if arguments.record:
+        with open(arguments.record, 'w') as file:
+            dump(sessions, file)
+
+    samples, duration = __run_sessions(get_client, sessions, min(arguments.users, len(sessions)), arguments.think_time)
+
+    report = __get_report(samples, duration)
+    __print_report(report)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
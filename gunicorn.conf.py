@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""Configuration of the production server (gunicorn): `gunicorn --config gunicorn.conf.py wsgi:application`
+
+The application is loaded by the master process before forking the workers (i.e. `preload_app`),
+then the data is read from the database (or a snapshot) and aggregated just once and the workers
+share its memory pages (copy-on-write), instead of each worker keeping its own copy.
+"""
+
+from gc import collect, freeze
+
+from modules.environment import SERVER_HOST, SERVER_PORT, SERVER_THREADS, SERVER_TIMEOUT, SERVER_WORKERS
+from modules.model import dispose_engine, reset_engine
+from modules.refresh import start_refreshers
+from modules.warmup import start_warmups
+
+
+bind = '{}:{}'.format(SERVER_HOST, SERVER_PORT)
+workers = SERVER_WORKERS
+threads = SERVER_THREADS
+timeout = SERVER_TIMEOUT
+
+preload_app = True
+
+
+def when_ready(server):
+    # the results that most users request are cached before forking, then all the workers start with them;
+    # after it, each worker warms up the new versions of its data in background
+    start_warmups(is_to_wait=True)
+
+    # the master does not query the database anymore, then its connections are closed before forking,
+    # otherwise the workers would inherit (and share) the same sockets
+    dispose_engine()
+
+    # move the objects that already exist to a generation that the garbage collector does not visit,
+    # then it does not write on their pages and they keep being shared by the workers
+    collect()
+    freeze()
+
+
+def post_fork(server, worker):
+    # each worker creates its own connection pool on its first query
+    reset_engine()
+
+
+def post_worker_init(worker):
+    # each worker refreshes its own data in background, the threads of the master are not copied by `fork`;
+    # if the data is shared (i.e. `IS_TO_USE_SHARED_DATA`), then just one worker refreshes it and writes
+    # the new snapshots, the other ones attach to them
+    start_refreshers()
@@ -7,8 +7,11 @@ from dash_html_components import Div
 
 from app import app, url_base_pathname
 import apps
-from modules.environment import DEBUG_MODE, SERVER_HOST, SERVER_PORT
+from modules.environment import DEBUG_MODE, IS_TO_USE_SHARED_DATA, SERVER_HOST, SERVER_PORT
 from modules.logging import logging
+from modules.metrics import instrument_callback
+from modules.refresh import follow_snapshots, start_refreshers
+from modules.warmup import start_warmups
 
 
 logging.info('main.py - DEBUG_MODE: %s', DEBUG_MODE)
@@ -22,18 +25,29 @@ app.layout = Div([
 ])
 
 
+# before each request, switch to the newest data written by the process that refreshes it
+if IS_TO_USE_SHARED_DATA:
+    app.server.before_request(follow_snapshots)
+
+
 @app.callback(Output('page-content', 'children'),
               [Input('url', 'pathname')])
+@instrument_callback
 def display_page(pathname):
     if pathname == '{}/'.format(url_base_pathname):
         return apps.layout_index
     if pathname == '{}/download'.format(url_base_pathname):
-        return apps.layout_download
+        return apps.get_layout_download()
     elif pathname == '{}/scene'.format(url_base_pathname):
-        return apps.layout_scene
+        return apps.get_layout_scene()
     else:
         return apps.layout_error_404
 
 
 if __name__ == '__main__':
+    # refresh the data in background while the server is running
+    start_refreshers()
+    # cache the results that most users request in background, while the server starts
+    start_warmups()
+
     app.run_server(debug=DEBUG_MODE, host=SERVER_HOST, port=SERVER_PORT)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from modules.logging import logging
+from modules.singleflight import SingleFlight
+
+
+class LRUCache():
+    """Thread-safe cache that discards the least recently used items when it is full.
+
+    If `ttl` (in seconds) is a positive number, then an item expires `ttl` seconds after being set.
+    If `maxbytes` is a positive number, then the items are also discarded when the sum of their
+    sizes (informed on `set`) is greater than it.
+    """
+
+    def __init__(self, name, maxsize=128, ttl=0, maxbytes=0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self.__lock = Lock()
+        # key -> (expiration time, value, size), the most recently used items are at the end
+        self.__items = OrderedDict()
+        self.__bytes = 0
+
+        # the concurrent misses of the same key are computed once
+        self.__flight = SingleFlight(name)
+
+    def __len__(self):
+        return len(self.__items)
+
+    @property
+    def stats(self):
+        return {
+            'name': self.name,
+            'items': len(self.__items),
+            'bytes': self.__bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.__flight.shared
+        }
+
+    def get(self, key, default=None):
+        with self.__lock:
+            item = self.__items.get(key)
+
+            if item is None:
+                self.misses += 1
+                return default
+
+            expiration, value, _ = item
+
+            if expiration is not None and expiration < monotonic():
+                self.__remove(key)
+                self.misses += 1
+                return default
+
+            self.__items.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value, size=0):
+        # an item bigger than the whole cache is not kept
+        if self.maxsize <= 0 or (self.maxbytes > 0 and size > self.maxbytes):
+            return
+
+        expiration = monotonic() + self.ttl if self.ttl > 0 else None
+
+        with self.__lock:
+            if key in self.__items:
+                self.__remove(key)
+
+            self.__items[key] = (expiration, value, size)
+            self.__bytes += size
+
+            while len(self.__items) > self.maxsize or (self.maxbytes > 0 and self.__bytes > self.maxbytes):
+                self.__remove(next(iter(self.__items)))
+
+    def __remove(self, key):
+        _, _, size = self.__items.pop(key)
+        self.__bytes -= size
+
+    def get_or_set(self, key, function, size=None):
+        # return the cached value of `key`, or call `function()` and cache its result;
+        # if several threads miss the same key at the same time, then `function()` is called just once
+        # and they share its result, `size(value)` returns the size of the result (see `maxbytes`)
+        value = self.get(key, _missing)
+
+        if value is not _missing:
+            return value
+
+        return self.__flight.do(key, lambda: self.__set_result(key, function, size))
+
+    def __set_result(self, key, function, size):
+        # the result may have been cached by a call that has just finished, before this one has started
+        with self.__lock:
+            item = self.__items.get(key)
+
+        if item is not None and (item[0] is None or item[0] >= monotonic()):
+            return item[1]
+
+        value = function()
+        self.set(key, value, size=size(value) if size else 0)
+
+        return value
+
+    def clear(self, *args):
+        # `*args` allows to use it as a listener (e.g. `DataStore.add_listener(cache.clear)`)
+        with self.__lock:
+            self.__items.clear()
+            self.__bytes = 0
+
+        logging.info('LRUCache.clear() - cache: %s\n', self.name)
+
+
+# it differs a missing item from an item whose value is `None`
+_missing = object()
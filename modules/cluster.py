@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+from numpy import arctan, argsort, asarray, bincount, clip, degrees, exp, flatnonzero, float64, floor, \
+                  int64, log, log2, maximum, minimum, pi, radians, sin, unique
+
+
+# the size of a map tile (in pixels) at the zoom 0
+TILE_SIZE = 256
+
+
+def get_x(longitude):
+    # project the longitude to the Web Mercator x between 0 and 1
+    return asarray(longitude, dtype=float64) / 360 + 0.5
+
+
+def get_y(latitude):
+    # project the latitude to the Web Mercator y between 0 (north) and 1 (south)
+    sin_latitude = sin(radians(asarray(latitude, dtype=float64)))
+    y = 0.5 - 0.25 * log((1 + sin_latitude) / (1 - sin_latitude)) / pi
+
+    return clip(y, 0, 1)
+
+
+def get_longitude(x):
+    return (asarray(x) - 0.5) * 360
+
+
+def get_latitude(y):
+    return degrees(2 * arctan(exp((0.5 - asarray(y)) * 2 * pi)) - pi / 2)
+
+
+def get_bounds(center, zoom, width, height):
+    # return the bounds ([[south, west], [north, east]]) of a map with `width` x `height` pixels
+    world_size = TILE_SIZE * 2 ** zoom
+
+    x = float(get_x(center[1]))
+    y = float(get_y(center[0]))
+
+    half_width = width / 2 / world_size
+    half_height = height / 2 / world_size
+
+    return [
+        [float(get_latitude(min(y + half_height, 1))), float(get_longitude(x - half_width))],
+        [float(get_latitude(max(y - half_height, 0))), float(get_longitude(x + half_width))]
+    ]
+
+
+def get_zoom_to_fit(bounds, width, height):
+    # return the greatest zoom whose map with `width` x `height` pixels shows all the bounds
+    (south, west), (north, east) = bounds
+
+    # the fraction of the world that the bounds take in each axis
+    size_x = max(float(get_x(east) - get_x(west)), 1e-9)
+    size_y = max(float(get_y(south) - get_y(north)), 1e-9)
+
+    return max(int(floor(log2(min(width / size_x, height / size_y) / TILE_SIZE))), 0)
+
+
+class ClusterIndex():
+    """Clusters of points by zoom level, as the markers of a map (Web Mercator).
+
+    At each zoom, the world is divided in square cells of `cell_size` pixels and the points in the same cell
+    are a cluster, placed at their centroid. The clusters of a zoom are created at its first query and
+    they are kept, then the next queries on the same zoom just select the clusters in the bounds.
+    Above `max_zoom` the points are not clustered anymore.
+    """
+
+    def __init__(self, longitude, latitude, value, cell_size=128, max_zoom=16):
+        self.longitude = asarray(longitude, dtype=float64)
+        self.latitude = asarray(latitude, dtype=float64)
+        self.value = asarray(value, dtype=float64)
+
+        self.x = get_x(self.longitude)
+        self.y = get_y(self.latitude)
+
+        self.cell_size = cell_size
+        self.max_zoom = max_zoom
+
+        # zoom -> clusters
+        self.__levels = {}
+
+    def __len__(self):
+        return len(self.x)
+
+    def __get_level(self, zoom):
+        level = self.__levels.get(zoom)
+
+        if level is not None:
+            return level
+
+        # number of cells by axis
+        number_of_cells = max((TILE_SIZE << zoom) // self.cell_size, 1)
+
+        column = minimum(floor(self.x * number_of_cells), number_of_cells - 1).astype(int64)
+        row = minimum(floor(self.y * number_of_cells), number_of_cells - 1).astype(int64)
+
+        # number each non-empty cell, then each point knows its cluster
+        _, clusters = unique(row * number_of_cells + column, return_inverse=True)
+
+        count = bincount(clusters)
+
+        # the points are sorted by cluster, then each cluster is a slice of them
+        order = argsort(clusters, kind='stable')
+        starts = count.cumsum() - count
+
+        level = {
+            'count': count,
+            # centroid of the points
+            'x': bincount(clusters, weights=self.x) / count,
+            'y': bincount(clusters, weights=self.y) / count,
+            'value': bincount(clusters, weights=self.value) / count,
+            # bounds of the points, they are used to zoom in on a cluster
+            'west': minimum.reduceat(self.longitude[order], starts),
+            'east': maximum.reduceat(self.longitude[order], starts),
+            'south': minimum.reduceat(self.latitude[order], starts),
+            'north': maximum.reduceat(self.latitude[order], starts),
+            # a cluster with one point is shown as the point itself
+            'first_point': order[starts]
+        }
+
+        self.__levels[zoom] = level
+
+        return level
+
+    def get_clusters(self, zoom, bounds):
+        """Return the points and the clusters with more than one point inside the bounds.
+
+        `bounds` is [[south, west], [north, east]]. The points are their indexes and each cluster
+        is a dict with its `longitude`, `latitude`, `count`, mean `value` and the `bounds` of its points.
+        """
+        (south, west), (north, east) = bounds
+
+        if not len(self):
+            return flatnonzero(self.x), []
+
+        if zoom > self.max_zoom:
+            is_inside = self.__is_inside(self.longitude, self.latitude, south, west, north, east)
+            return flatnonzero(is_inside), []
+
+        level = self.__get_level(max(int(zoom), 0))
+
+        longitude = get_longitude(level['x'])
+        latitude = get_latitude(level['y'])
+
+        is_inside = self.__is_inside(longitude, latitude, south, west, north, east)
+
+        is_point = level['count'] == 1
+
+        points = level['first_point'][is_inside & is_point]
+
+        clusters = [
+            {
+                'longitude': float(longitude[i]),
+                'latitude': float(latitude[i]),
+                'count': int(level['count'][i]),
+                'value': float(level['value'][i]),
+                'bounds': [
+                    [float(level['south'][i]), float(level['west'][i])],
+                    [float(level['north'][i]), float(level['east'][i])]
+                ]
+            }
+            for i in flatnonzero(is_inside & ~is_point)
+        ]
+
+        return points, clusters
+
+    @staticmethod
+    def __is_inside(longitude, latitude, south, west, north, east):
+        is_inside = (latitude >= south) & (latitude <= north)
+
+        # the bounds cover the whole world
+        if east - west >= 360:
+            return is_inside
+
+        # normalize the longitudes to [-180, 180), the bounds may cross the antimeridian
+        west = (west + 180) % 360 - 180
+        east = (east + 180) % 360 - 180
+
+        if west <= east:
+            return is_inside & (longitude >= west) & (longitude <= east)
+
+        return is_inside & ((longitude >= west) | (longitude <= east))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+from numpy import add, arange, asarray, clip, flatnonzero, iinfo, int32, int64, nonzero, unique, zeros
+from pandas import Series
+from pandas.api.types import is_categorical_dtype
+
+
+def get_month_ordinal(year_month):
+    # convert a 'YYYY-MM' string to the number of months since the year 0
+    return int(year_month[:4]) * 12 + int(year_month[5:7]) - 1
+
+
+def get_year_month(month_ordinal):
+    # convert a number of months since the year 0 to a 'YYYY-MM' string
+    return '{:04d}-{:02d}'.format(month_ordinal // 12, month_ordinal % 12 + 1)
+
+
+def get_month_ordinals(dates):
+    # convert a `datetime64` series to the number of months since the year 0, without a Python call by date
+    return (dates.dt.year * 12 + dates.dt.month - 1).astype('int32')
+
+
+def get_year_months(month_ordinals):
+    # convert a series of numbers of months since the year 0 to 'YYYY-MM' strings,
+    # each different month is formatted once
+    year_months = {month_ordinal: get_year_month(int(month_ordinal)) for month_ordinal in unique(month_ordinals)}
+
+    return Series(month_ordinals).map(year_months)
+
+
+class PrefixSumCube():
+    """Dense cube of values by group (e.g. dataset) and month, with cumulative sums along the months.
+
+    The months are numbers of months since the year 0 (see `get_month_ordinal`).
+    The value of a group in a range of months is the subtraction of two cumulative sums, then
+    the cost of a query depends on the number of groups and on the size of the range, but not
+    on how many months the cube contains.
+    """
+
+    def __init__(self, df, group_by, month='year_month', value='number', sort=True):
+        self.group_by = list(group_by)
+        self.month = month
+        self.value = value
+        # the columns of the dataframes returned by `to_df` follow the order of the original one
+        self.columns = df.columns.tolist()
+
+        # number each group, the rows with a missing key (i.e. -1) are ignored
+        group_codes = df.groupby(self.group_by, sort=sort, observed=True).ngroup().values
+        is_valid = group_codes >= 0
+        group_codes = group_codes[is_valid]
+
+        # the keys of each group in the order of the codes
+        _, first_indexes = unique(group_codes, return_index=True)
+        self.keys = df[self.group_by][is_valid].iloc[first_indexes].reset_index(drop=True)
+
+        # the keys are few, then the categories are kept as their values (e.g. strings)
+        for column in self.group_by:
+            if is_categorical_dtype(self.keys[column].dtype):
+                self.keys[column] = self.keys[column].astype(self.keys[column].cat.categories.dtype)
+
+        # the months are continuous between the first and the last ones, even if a month does not have values
+        month_ordinals = asarray(df[month][is_valid].values, dtype=int64)
+        self.first_month = int(month_ordinals.min()) if len(month_ordinals) else 0
+        number_of_months = int(month_ordinals.max()) - self.first_month + 1 if len(month_ordinals) else 0
+
+        self.months = arange(self.first_month, self.first_month + number_of_months, dtype=int32)
+
+        values = df[value][is_valid].values
+        dtype = int32 if values.sum() < iinfo(int32).max else int64
+
+        counts = zeros((len(self.keys), number_of_months), dtype=dtype)
+        add.at(counts, (group_codes, month_ordinals - self.first_month), values)
+
+        # `cumsum[:, i]` is the sum of the months before the month `i`
+        self.cumsum = zeros((len(self.keys), number_of_months + 1), dtype=dtype)
+        counts.cumsum(axis=1, out=self.cumsum[:, 1:])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_month_range(self, start_month, end_month):
+        # return the indexes [start, end) of the months between `start_month` and `end_month` (inclusive)
+        number_of_months = len(self.months)
+
+        start = int(clip(start_month - self.first_month, 0, number_of_months))
+        end = int(clip(end_month - self.first_month + 1, 0, number_of_months))
+
+        return start, max(start, end)
+
+    def get_totals(self, start_month, end_month):
+        # return the total of each group in the range of months
+        start, end = self.get_month_range(start_month, end_month)
+        return self.cumsum[:, end] - self.cumsum[:, start]
+
+    def to_df(self, start_month, end_month, ascending=True):
+        # return the rows (i.e. group and month) with values in the range of months,
+        # sorted by month and then by group
+        start, end = self.get_month_range(start_month, end_month)
+
+        # just the groups with values in the range are used
+        groups = flatnonzero(self.cumsum[:, end] - self.cumsum[:, start])
+
+        counts = self.cumsum[groups, start + 1:end + 1] - self.cumsum[groups, start:end]
+
+        month_indexes = arange(start, end)
+
+        if not ascending:
+            counts = counts[:, ::-1]
+            month_indexes = month_indexes[::-1]
+
+        # transpose the counts in order to get the rows sorted by month and then by group
+        month_positions, group_positions = nonzero(counts.T)
+
+        df = self.keys.iloc[groups[group_positions]].reset_index(drop=True)
+        df[self.month] = self.months[month_indexes[month_positions]]
+        df[self.value] = counts[group_positions, month_positions]
+
+        return df[self.columns]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from numpy import abs as np_abs, arange, asarray, float64, int64, zeros
+
+
+def get_lttb_indexes(x, y, number_of_points):
+    """Return the indexes of the points selected by the Largest-Triangle-Three-Buckets algorithm.
+
+    The points (sorted by `x`) are divided in `number_of_points - 2` buckets, plus the first and
+    the last points, and the point of each bucket that makes the largest triangle with the point
+    selected in the previous bucket and the mean of the next bucket is kept. Then the shape of
+    the series (e.g. the peaks) is kept with much less points.
+    """
+    x = asarray(x, dtype=float64)
+    y = asarray(y, dtype=float64)
+
+    length = len(x)
+
+    if number_of_points >= length or number_of_points < 3:
+        return arange(length)
+
+    indexes = zeros(number_of_points, dtype=int64)
+    indexes[-1] = length - 1
+
+    # the first and the last points are always kept, the other ones are divided in buckets
+    bucket_size = (length - 2) / (number_of_points - 2)
+
+    # limits of the buckets, the bucket `i` is [limits[i], limits[i + 1])
+    limits = (arange(number_of_points - 1) * bucket_size).astype(int64) + 1
+    limits[-1] = length - 1
+
+    selected = 0
+
+    for i in range(number_of_points - 2):
+        start, end = limits[i], limits[i + 1]
+
+        # the next bucket is represented by its mean, the last bucket is followed by the last point
+        next_start, next_end = (limits[i + 1], limits[i + 2]) if i + 2 < len(limits) else (length - 1, length)
+        mean_x = x[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+
+        # double of the area of the triangles (the selected point, each point of the bucket, the next mean)
+        areas = np_abs(
+            (x[selected] - mean_x) * (y[start:end] - y[selected]) -
+            (x[selected] - x[start:end]) * (mean_y - y[selected])
+        )
+
+        selected = start + int(areas.argmax())
+        indexes[i + 1] = selected
+
+    return indexes
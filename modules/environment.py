@@ -16,11 +16,85 @@ os_environ_get = environ.get
 # False: the application will get the data from a CSV file
 IS_TO_USE_DATA_FROM_DB = str2bool(os_environ_get('IS_TO_USE_DATA_FROM_DB', 'False'))
 
+# if it is informed, then the download data is read from this CSV file (e.g. an export of `dash_download_nofbs`),
+# instead of the database, it allows running the application (e.g. a load test) without the database
+DOWNLOAD_CSV_FILE = os_environ_get('DOWNLOAD_CSV_FILE', '')
+
+# True: the callbacks group the data in the database and just the grouped rows are returned
+# False: the callbacks group the data that is in memory
+IS_TO_USE_SQL_PUSHDOWN = str2bool(os_environ_get('IS_TO_USE_SQL_PUSHDOWN', 'False'))
+
+# number of seconds between two refreshes of the data from the database (0 disables the refresh)
+REFRESH_INTERVAL = int(os_environ_get('REFRESH_INTERVAL', 300))
+
+# True: the data is saved on disk (snapshot) and it is read from there on the next start, if it is still valid
+IS_TO_USE_SNAPSHOT = str2bool(os_environ_get('IS_TO_USE_SNAPSHOT', 'True'))
+SNAPSHOT_DIRECTORY = os_environ_get('SNAPSHOT_DIRECTORY', 'data/snapshot')
+
+# maximum number of filtered results kept in memory by the callbacks (0 disables the cache)
+FILTER_CACHE_SIZE = int(os_environ_get('FILTER_CACHE_SIZE', 64))
+# number of seconds that a filtered result is kept in memory (0 keeps it until the data changes)
+FILTER_CACHE_TTL = int(os_environ_get('FILTER_CACHE_TTL', 600))
+
+# maximum number of figures and maximum size (in bytes) of the figures kept in memory by the callbacks
+FIGURE_CACHE_SIZE = int(os_environ_get('FIGURE_CACHE_SIZE', 128))
+FIGURE_CACHE_MAX_BYTES = int(os_environ_get('FIGURE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# number of seconds that a figure is kept in memory (0 keeps it until it is discarded by the limits above)
+FIGURE_CACHE_TTL = int(os_environ_get('FIGURE_CACHE_TTL', 600))
+
+# maximum number of views of the download map (i.e. date range, limit, center and zoom) kept in memory
+# by the callbacks (0 disables the cache), they are kept for `FILTER_CACHE_TTL` seconds
+MAP_CACHE_SIZE = int(os_environ_get('MAP_CACHE_SIZE', 32))
+
+# True: the markers of the download map are sent as geobuf (i.e. binary), instead of plain GeoJSON,
+# it makes the uncompressed response smaller, but the encoding spends more CPU time on the server and,
+# as the responses are compressed by gzip (see `app.py`), it saves little or nothing on the wire
+IS_TO_USE_GEOBUF = str2bool(os_environ_get('IS_TO_USE_GEOBUF', 'False'))
+
+# maximum number of points plotted by the time series, the other ones are discarded by downsampling (LTTB),
+# when the user zooms in the chart, the visible range is plotted again with this number of points (0 disables it);
+# the figure is sent compressed by gzip (see `app.py`), its compressed size also decreases with the number of points
+TIME_SERIES_MAX_POINTS = int(os_environ_get('TIME_SERIES_MAX_POINTS', 0))
+
+# True: the scene page receives a compact cube with the number of scenes by dataset, month and location once,
+# then the browser filters it by the date range and builds the figures (i.e. without a request to the server)
+IS_TO_USE_CLIENTSIDE_FILTERING = str2bool(os_environ_get('IS_TO_USE_CLIENTSIDE_FILTERING', 'False'))
+
+# True: the processes of the server (e.g. the workers of gunicorn) share the data through the snapshots
+# (i.e. `IS_TO_USE_SNAPSHOT` must be enabled), just one of them refreshes the data and writes a new snapshot,
+# the other ones attach to it on their next request, the directory may be on a tmpfs (e.g. `/dev/shm`)
+IS_TO_USE_SHARED_DATA = str2bool(os_environ_get('IS_TO_USE_SHARED_DATA', 'False'))
+
+# True: the latency, the errors and the response size of the callbacks and the latency of the database queries
+# are recorded and exposed on `/metrics` (Prometheus text format), the route is not authenticated, then it must
+# not be enabled on a public server, unless `/metrics` is blocked by the proxy (e.g. allowed just to Prometheus)
+IS_TO_USE_METRICS = str2bool(os_environ_get('IS_TO_USE_METRICS', 'False'))
+
+# True: a callback request with the `X-Profile` header or the `profile` query parameter (also on the URL of the page)
+# is profiled and its profile is returned by `/profiles`, and the slowest requests are kept with their inputs
+# on `/profiles/slowest`, it must not be enabled on a public server, because the routes show the inputs of the users
+IS_TO_USE_PROFILING = str2bool(os_environ_get('IS_TO_USE_PROFILING', 'False'))
+# number of slowest requests that are kept
+PROFILING_SLOWEST_REQUESTS = int(os_environ_get('PROFILING_SLOWEST_REQUESTS', 20))
+
+# True: after the data is loaded and after each refresh, the results that most users request (i.e. the tables,
+# the figures and the map of the default date ranges and the ranges of the time series buttons) are computed
+# in background and cached, the progress is shown on `/warmup`
+IS_TO_USE_WARMUP = str2bool(os_environ_get('IS_TO_USE_WARMUP', 'True'))
+# number of threads that compute the results of the warm-up
+WARMUP_WORKERS = int(os_environ_get('WARMUP_WORKERS', 2))
+
 DEBUG_MODE = str2bool(os_environ_get('DEBUG_MODE', 'True'))
 
 SERVER_HOST = os_environ_get('SERVER_HOST', '0.0.0.0')
 SERVER_PORT = int(os_environ_get('SERVER_PORT', 8050))
 
+# production server (see `gunicorn.conf.py`): number of worker processes, number of threads by worker
+# and how many seconds a request may take before its worker is restarted
+SERVER_WORKERS = int(os_environ_get('SERVER_WORKERS', 2))
+SERVER_THREADS = int(os_environ_get('SERVER_THREADS', 4))
+SERVER_TIMEOUT = int(os_environ_get('SERVER_TIMEOUT', 120))
+
 # default logging level in production server
 LOGGING_LEVEL = INFO
 
@@ -34,3 +108,15 @@ MYSQL_DB_PASSWORD = os_environ_get('MYSQL_DB_PASSWORD', 'test')
 MYSQL_DB_HOST = os_environ_get('MYSQL_DB_HOST', 'localhost')
 MYSQL_DB_PORT = int(os_environ_get('MYSQL_DB_PORT', 3306))
 MYSQL_DB_DATABASE = os_environ_get('MYSQL_DB_DATABASE', 'database')
+
+# MYSQL connection pool, it is shared by all queries of the process
+MYSQL_DB_POOL_SIZE = int(os_environ_get('MYSQL_DB_POOL_SIZE', 5))
+MYSQL_DB_MAX_OVERFLOW = int(os_environ_get('MYSQL_DB_MAX_OVERFLOW', 10))
+MYSQL_DB_POOL_PRE_PING = str2bool(os_environ_get('MYSQL_DB_POOL_PRE_PING', 'True'))
+# number of seconds after which a connection is recycled
+MYSQL_DB_POOL_RECYCLE = int(os_environ_get('MYSQL_DB_POOL_RECYCLE', 3600))
+# number of seconds to wait for a free connection from the pool
+MYSQL_DB_POOL_TIMEOUT = int(os_environ_get('MYSQL_DB_POOL_TIMEOUT', 30))
+# number of seconds to wait to open a connection and to read a query result
+MYSQL_DB_CONNECT_TIMEOUT = int(os_environ_get('MYSQL_DB_CONNECT_TIMEOUT', 10))
+MYSQL_DB_READ_TIMEOUT = int(os_environ_get('MYSQL_DB_READ_TIMEOUT', 60))
@@ -2,3 +2,7 @@
 
 class CatalogDashException(Exception):
     pass
+
+
+class DatabaseConnectionException(CatalogDashException):
+    pass
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""Metrics of the callbacks and of the database queries, exposed as Prometheus text on `/metrics`.
+
+The callbacks are wrapped by `instrument_callback`, that records their latency, their errors and
+the rows that they have scanned, and the size of their serialized responses is recorded after each request.
+Each process keeps its own metrics, e.g. each worker of gunicorn answers `/metrics` with the requests that it has
+received, as the `process` label shows.
+"""
+
+from functools import wraps
+from os import getpid
+from threading import Lock
+from time import perf_counter
+
+from dash.exceptions import PreventUpdate
+from flask import g, has_request_context
+
+from modules.environment import IS_TO_USE_METRICS
+
+
+# upper bounds of the buckets of the histograms, in seconds and in bytes
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+size_buckets = tuple(1024 * 4 ** i for i in range(9))
+
+# name -> (type, description, buckets), in the order that they are exposed
+metrics = {
+    'catalog_dash_callback_duration_seconds': (
+        'histogram', 'Time spent by the callbacks, in seconds.', latency_buckets
+    ),
+    'catalog_dash_callback_response_bytes': (
+        'histogram', 'Size of the responses of the callbacks as they are sent (i.e. compressed, if the client '
+                     'accepts it), in bytes.', size_buckets
+    ),
+    'catalog_dash_callback_errors_total': (
+        'counter', 'Number of callbacks that have raised an exception (except `PreventUpdate`).', None
+    ),
+    'catalog_dash_callback_prevented_total': (
+        'counter', 'Number of callbacks that have not updated their outputs (i.e. `PreventUpdate`).', None
+    ),
+    'catalog_dash_callback_rows_scanned_total': (
+        'counter', 'Number of dataframe and database rows scanned by the callbacks.', None
+    ),
+    'catalog_dash_singleflight_shared_total': (
+        'counter', 'Number of calls that have shared the result of an identical concurrent call.', None
+    ),
+    'catalog_dash_warmup_tasks_total': (
+        'counter', 'Number of warm-up tasks, by status (i.e. done, failed or skipped by a newer version of the data).', None
+    ),
+    'catalog_dash_database_query_duration_seconds': (
+        'histogram', 'Time spent by the database queries, in seconds.', latency_buckets
+    ),
+    'catalog_dash_database_query_errors_total': (
+        'counter', 'Number of database queries that have failed.', None
+    ),
+    'catalog_dash_database_rows_total': (
+        'counter', 'Number of rows returned by the database queries.', None
+    )
+}
+
+_lock = Lock()
+# (name, labels) -> value of a counter or [bucket counts, sum, count] of a histogram,
+# `labels` is a tuple of (label, value) pairs
+_values = {}
+
+
+##################################################
+# record
+##################################################
+
+def increment(name, value=1, **labels):
+    if not IS_TO_USE_METRICS:
+        return
+
+    key = (name, tuple(sorted(labels.items())))
+
+    with _lock:
+        _values[key] = _values.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    # add `value` to the histogram `name`
+    if not IS_TO_USE_METRICS:
+        return
+
+    key = (name, tuple(sorted(labels.items())))
+    buckets = metrics[name][2]
+
+    with _lock:
+        histogram = _values.get(key)
+
+        if histogram is None:
+            histogram = _values[key] = [[0] * len(buckets), 0.0, 0]
+
+        # the buckets are cumulative (i.e. a value is counted by all the buckets greater than or equal to it)
+        for i, bucket in enumerate(buckets):
+            if value <= bucket:
+                histogram[0][i] += 1
+
+        histogram[1] += value
+        histogram[2] += 1
+
+
+def add_rows_scanned(rows):
+    # add `rows` to the rows scanned by the callback of the current request, if there is one
+    if IS_TO_USE_METRICS and has_request_context() and 'callback' in g:
+        g.rows_scanned += rows
+
+
+##################################################
+# instrumentation
+##################################################
+
+def instrument_callback(function):
+    """Record the latency, the errors and the rows scanned by a callback, labeled by its function name.
+
+    It must be between `@app.callback` and the function, e.g. `app.callback(...)(instrument_callback(function))`.
+    """
+    if not IS_TO_USE_METRICS:
+        return function
+
+    name = function.__name__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        # the response is serialized and compressed after the callback, its size is recorded by `record_response_size`
+        g.callback = name
+        g.rows_scanned = 0
+
+        start = perf_counter()
+
+        try:
+            return function(*args, **kwargs)
+
+        except PreventUpdate:
+            increment('catalog_dash_callback_prevented_total', callback=name)
+            raise
+
+        except Exception as error:
+            increment('catalog_dash_callback_errors_total', callback=name, exception=type(error).__name__)
+            raise
+
+        finally:
+            observe('catalog_dash_callback_duration_seconds', perf_counter() - start, callback=name)
+            increment('catalog_dash_callback_rows_scanned_total', g.rows_scanned, callback=name)
+
+    return wrapper
+
+
+def record_response_size(response):
+    # it is registered as an `after_request` function of the server that runs after `Compress` (see `app.py`),
+    # then it records the size that is sent, i.e. compressed, if the client accepts it
+    # (a callback that has not updated its outputs has an empty response)
+    if IS_TO_USE_METRICS and 'callback' in g:
+        observe('catalog_dash_callback_response_bytes', response.calculate_content_length() or 0, callback=g.callback)
+
+    return response
+
+
+##################################################
+# exposition
+##################################################
+
+def __format_labels(labels):
+    # e.g. {callback="display_page",le="0.5"}, the backslashes, quotes and line breaks are escaped
+    if not labels:
+        return ''
+
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            label, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        )
+        for label, value in labels
+    ) + '}'
+
+
+def __format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def get_metrics_text():
+    # return the metrics in the text format of Prometheus
+    with _lock:
+        values = {key: (list(value[0]), value[1], value[2]) if isinstance(value, list) else value
+                  for key, value in _values.items()}
+
+    process = (('process', getpid()),)
+    lines = []
+
+    for name, (kind, description, buckets) in metrics.items():
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} {}'.format(name, kind))
+
+        for (item_name, labels), value in sorted(values.items(), key=lambda item: str(item[0])):
+            if item_name != name:
+                continue
+
+            labels = labels + process
+
+            if kind == 'counter':
+                lines.append('{}{} {}'.format(name, __format_labels(labels), __format_number(value)))
+                continue
+
+            counts, total, count = value
+
+            for bucket, bucket_count in zip(buckets + (float('inf'),), counts + [count]):
+                lines.append('{}_bucket{} {}'.format(
+                    name, __format_labels(labels + (('le', __format_number(float(bucket))),)), bucket_count
+                ))
+
+            lines.append('{}_sum{} {}'.format(name, __format_labels(labels), __format_number(total)))
+            lines.append('{}_count{} {}'.format(name, __format_labels(labels), count))
+
+    return '\n'.join(lines) + '\n'
@@ -1,16 +1,121 @@
 # -*- coding: utf-8 -*-
 
+from os import getpid, register_at_fork
+from re import IGNORECASE, compile as re_compile
+from threading import Lock
+from time import perf_counter
+
 from pandas import read_sql, to_datetime
 import pymysql
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DisconnectionError, SQLAlchemyError
 from werkzeug.exceptions import InternalServerError
 
 from modules.environment import MYSQL_DB_USER, MYSQL_DB_PASSWORD, MYSQL_DB_HOST, \
-                                MYSQL_DB_PORT, MYSQL_DB_DATABASE
+                                MYSQL_DB_PORT, MYSQL_DB_DATABASE, \
+                                MYSQL_DB_POOL_SIZE, MYSQL_DB_MAX_OVERFLOW, MYSQL_DB_POOL_PRE_PING, \
+                                MYSQL_DB_POOL_RECYCLE, MYSQL_DB_POOL_TIMEOUT, \
+                                MYSQL_DB_CONNECT_TIMEOUT, MYSQL_DB_READ_TIMEOUT
+from modules.exception import DatabaseConnectionException
 from modules.logging import logging
+from modules.metrics import add_rows_scanned, increment, observe
+
+
+# the table of a query labels its metrics, e.g. `SELECT * FROM `scene_dataset`;` -> scene_dataset
+table_expression = re_compile(r'\bFROM\s+`?(\w+)`?', IGNORECASE)
+
+
+##################################################
+# engine
+##################################################
+
+# the engine (i.e. the connection pool) is shared by all `DatabaseConnection` objects of the process,
+# then the queries do not need to open a new connection to the database every time
+_engine = None
+_engine_lock = Lock()
+
+
+def __add_pid_guard(engine):
+    # a connection opened by a process must not be used by another one (e.g. a forked worker)
+    # Source: https://docs.sqlalchemy.org/en/13/core/pooling.html#using-connection-pools-with-multiprocessing
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        connection_record.info['pid'] = getpid()
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        pid = getpid()
+
+        if connection_record.info['pid'] != pid:
+            # the pool discards this connection and tries to open a new one
+            connection_record.connection = connection_proxy.connection = None
+
+            raise DisconnectionError(
+                'Connection record belongs to pid {}, attempting to check out in pid {}'.format(
+                    connection_record.info['pid'], pid
+                )
+            )
+
+
+def get_engine():
+    global _engine
+
+    # double-checked locking, in order to create just one engine even with concurrent callbacks
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                logging.info('get_engine() - creating a new engine to the database\n')
+
+                _engine = create_engine(
+                    'mysql+pymysql://{}:{}@{}:{}/{}'.format(
+                        MYSQL_DB_USER, MYSQL_DB_PASSWORD, MYSQL_DB_HOST,
+                        MYSQL_DB_PORT, MYSQL_DB_DATABASE
+                    ),
+                    pool_size=MYSQL_DB_POOL_SIZE,
+                    max_overflow=MYSQL_DB_MAX_OVERFLOW,
+                    pool_pre_ping=MYSQL_DB_POOL_PRE_PING,
+                    pool_recycle=MYSQL_DB_POOL_RECYCLE,
+                    pool_timeout=MYSQL_DB_POOL_TIMEOUT,
+                    connect_args={
+                        'connect_timeout': MYSQL_DB_CONNECT_TIMEOUT,
+                        'read_timeout': MYSQL_DB_READ_TIMEOUT
+                    }
+                )
+
+                __add_pid_guard(_engine)
+
+    return _engine
+
+
+def reset_engine():
+    # forget the engine inherited from the parent process without closing its connections,
+    # because they are still being used by the parent process
+    global _engine, _engine_lock
+
+    _engine = None
+    _engine_lock = Lock()
 
 
+def dispose_engine():
+    # close all the connections of the pool (e.g. when the process is shutting down)
+    global _engine
+
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+
+        _engine = None
+
+
+# a forked process (e.g. a server worker) creates its own engine on its first query
+register_at_fork(after_in_child=reset_engine)
+
+
+##################################################
+# connection
+##################################################
+
 class DatabaseConnection():
 
     def __init__(self):
@@ -18,10 +123,7 @@ class DatabaseConnection():
 
     def connect(self):
         try:
-            self.engine = create_engine('mysql+pymysql://{}:{}@{}:{}/{}'.format(
-                MYSQL_DB_USER, MYSQL_DB_PASSWORD, MYSQL_DB_HOST,
-                MYSQL_DB_PORT, MYSQL_DB_DATABASE
-            ))
+            self.engine = get_engine()
 
         except SQLAlchemyError as error:
             error_message = 'An error occurred during database connection'
@@ -36,9 +138,7 @@ class DatabaseConnection():
             raise InternalServerError(error_message)
 
     def close(self):
-        if self.engine is not None:
-            self.engine.dispose()
-
+        # the engine is not disposed, because its pool is shared by the process
         self.engine = None
 
     def try_to_connect(self):
@@ -53,15 +153,25 @@ class DatabaseConnection():
             self.close()
             raise DatabaseConnectionException('Connection was not opened to the database.')
 
-    def execute(self, query):
+    def execute(self, query, params=None):
         logging.info('DatabaseConnection.execute()\n')
 
+        match = table_expression.search(query)
+        table = match.group(1) if match else 'unknown'
+
+        start = perf_counter()
+
         try:
-            logging.info('DatabaseConnection.execute() - query: %s\n', query)
+            logging.info('DatabaseConnection.execute() - query: %s', query)
+            logging.info('DatabaseConnection.execute() - params: %s\n', params)
 
             self.try_to_connect()
 
-            df = read_sql(query, con=self.engine)
+            # `text` allows to use bound parameters (e.g. `:since`) in the query
+            df = read_sql(text(query), con=self.engine, params=params)
+
+            increment('catalog_dash_database_rows_total', len(df), table=table)
+            add_rows_scanned(len(df))
 
             # logging.info('DatabaseConnection.execute() - df.head(): \n%s\n', df.head())
             # logging.info('DatabaseConnection.execute() - df.shape: %s\n', df.shape)
@@ -79,14 +189,22 @@ class DatabaseConnection():
 
             error_message += ': ' + str(error.args)
 
+            increment('catalog_dash_database_query_errors_total', table=table)
+
             raise InternalServerError(error_message)
 
         # finally is always executed (both at try and except)
         finally:
+            observe('catalog_dash_database_query_duration_seconds', perf_counter() - start, table=table)
+
             self.close()
 
-    def select_from_scene_dataset(self):
-        df = self.execute('SELECT * FROM `scene_dataset`;')
+    def select_from_scene_dataset(self, since=None):
+        # if `since` is informed, then just the rows from this date on are returned
+        if since is None:
+            df = self.execute('SELECT * FROM `scene_dataset`;')
+        else:
+            df = self.execute('SELECT * FROM `scene_dataset` WHERE `date` >= :since;', {'since': since})
 
         # convert date, from `str` to a `datetime`
         df['date'] = to_datetime(df['date'])
@@ -96,5 +214,50 @@ class DatabaseConnection():
     # def select_from_dash_download(self):
     #     return self.execute('SELECT * FROM dash_download;')
 
-    def select_from_dash_download_nofbs(self):
-        return self.execute('SELECT * FROM dash_download_nofbs;')
+    def select_from_dash_download_nofbs(self, since=None):
+        # if `since` is informed, then just the rows from this date on are returned
+        if since is None:
+            return self.execute('SELECT * FROM dash_download_nofbs;')
+
+        return self.execute('SELECT * FROM dash_download_nofbs WHERE `date` >= :since;', {'since': since})
+
+    def select_count_from_scene_dataset(self, start_date, end_date, group_by_location=False):
+        # count the scenes by dataset and year_month (and location) from `start_date` (inclusive)
+        # to `end_date` (exclusive), then just the grouped rows are returned
+        # `year_month` is the number of months since the year 0, as in the dataframes that are in memory
+        # the rows are sorted in the same way of the dataframes that are in memory
+        if group_by_location:
+            columns = 'dataset, `year_month`, longitude, latitude'
+            order_by = '`year_month`, dataset, longitude, latitude'
+        else:
+            columns = 'dataset, `year_month`'
+            order_by = '`year_month` DESC, dataset DESC'
+
+        query = (
+            "SELECT COUNT(scene_id) AS number, {columns}"
+            " FROM (SELECT scene_id, dataset, longitude, latitude,"
+            "             YEAR(`date`) * 12 + MONTH(`date`) - 1 AS `year_month`"
+            "       FROM `scene_dataset` WHERE `date` >= :start_date AND `date` < :end_date) AS sd"
+            " GROUP BY {columns} ORDER BY {order_by};"
+        ).format(columns=columns, order_by=order_by)
+
+        return self.execute(query, {'start_date': start_date, 'end_date': end_date})
+
+    def select_count_from_dash_download_nofbs(self, start_date, end_date, limit=0):
+        # count the downloaded scenes by user, date and location between `start_date` and `end_date`,
+        # then just the `limit` groups with more downloaded scenes are returned
+        query = (
+            'SELECT COUNT(scene_id) AS number, user_id, name, `date`, longitude, latitude'
+            ' FROM dash_download_nofbs'
+            ' WHERE `date` BETWEEN :start_date AND :end_date'
+            ' GROUP BY user_id, name, `date`, longitude, latitude'
+            ' ORDER BY number DESC'
+        )
+        params = {'start_date': start_date, 'end_date': end_date}
+
+        # if limit is not a positive number, then all the groups are returned
+        if limit > 0:
+            query += ' LIMIT :limit'
+            params['limit'] = limit
+
+        return self.execute(query + ';', params)
\ No newline at end of file
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+"""Profile the requests of the callbacks on demand and keep the slowest requests with their inputs.
+
+If `IS_TO_USE_PROFILING` is enabled, a callback request is profiled when it has the `X-Profile` header or
+the `profile` query parameter, either on its own URL or on the URL of the page that has sent it (i.e. the browser
+sends the callbacks of `/catalog-dash/download?profile=1` profiled). The request runs under `cProfile` and,
+at the same time, a thread samples its stack, then the `pstats` dump and the collapsed stacks (i.e. the input
+of flame graph tools, e.g. `flamegraph.pl` or speedscope) are kept in memory and returned by `/profiles`.
+
+Each process keeps its own profiles, e.g. each worker of gunicorn returns just the requests that it has received.
+"""
+
+from cProfile import Profile
+from collections import Counter, OrderedDict
+from datetime import datetime
+from heapq import heappush, heappushpop
+from io import StringIO
+from itertools import count
+from marshal import dumps as marshal_dumps
+from os.path import abspath, dirname, relpath
+from pstats import Stats
+from sys import _current_frames
+from threading import Event, Lock, Thread, get_ident
+from time import perf_counter
+from urllib.parse import parse_qs, urlparse
+
+from flask import g, request
+
+from modules.environment import PROFILING_SLOWEST_REQUESTS
+from modules.logging import logging
+
+
+# the header and the query parameter that ask for profiling a request
+profile_header = 'X-Profile'
+profile_parameter = 'profile'
+
+# number of profiles kept in memory, the oldest ones are discarded
+max_profiles = 20
+# number of seconds between two samples of the stack of a profiled request
+sampling_interval = 0.001
+
+root_directory = dirname(dirname(abspath(__file__)))
+
+# just one request is profiled at a time, because `cProfile` does not support concurrent profilers
+_profile_lock = Lock()
+
+_profiles_lock = Lock()
+# id -> profile, the most recent ones are at the end
+_profiles = OrderedDict()
+_profile_ids = count(1)
+
+_slowest_lock = Lock()
+# min-heap of (duration, order, request), then the fastest of the slowest requests is replaced first
+_slowest_requests = []
+_order = count()
+
+
+##################################################
+# sampler
+##################################################
+
+class StackSampler(Thread):
+    """Thread that samples the stack of another thread and counts the collapsed stacks.
+
+    A collapsed stack is a line with the functions from the root to the leaf separated by `;`,
+    e.g. `wrapper (modules/metrics.py:116);create_figures (apps/scene/callback.py:72)`.
+    """
+
+    def __init__(self, thread_id, interval=sampling_interval):
+        super().__init__(name='stack-sampler', daemon=True)
+
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+
+        self.__stop = Event()
+
+    def __get_frame_name(self, code):
+        filename = code.co_filename
+
+        # the files of the application are shown relative to its root, the other ones by their package
+        if filename.startswith(root_directory):
+            filename = relpath(filename, root_directory)
+        elif 'site-packages/' in filename:
+            filename = filename.split('site-packages/', 1)[1]
+
+        return '{} ({}:{})'.format(code.co_name, filename, code.co_firstlineno)
+
+    def run(self):
+        while not self.__stop.wait(self.interval):
+            frame = _current_frames().get(self.thread_id)
+            names = []
+
+            while frame is not None:
+                names.append(self.__get_frame_name(frame.f_code))
+                frame = frame.f_back
+
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self.__stop.set()
+        self.join()
+
+    def get_collapsed_stacks(self):
+        # one stack by line followed by the number of samples, e.g. `a;b;c 10`
+        return ''.join('{} {}\n'.format(stack, samples) for stack, samples in self.stacks.most_common())
+
+
+##################################################
+# request hooks
+##################################################
+
+def __is_profiling_requested():
+    if request.headers.get(profile_header) or request.args.get(profile_parameter):
+        return True
+
+    # the browser sends the callbacks with the URL of the page as the referrer
+    return bool(request.referrer) and profile_parameter in parse_qs(urlparse(request.referrer).query)
+
+
+def __get_callback_request():
+    # the output, the inputs and the state of a callback request, as the browser has sent them
+    body = request.get_json(silent=True) or {}
+
+    return {
+        'callback': body.get('output'),
+        'inputs': body.get('inputs'),
+        'state': body.get('state')
+    }
+
+
+def start_profiling():
+    # it is registered as a `before_request` function of the server
+    if not request.path.endswith('/_dash-update-component'):
+        return
+
+    g.profiling_start = perf_counter()
+
+    # if another request is being profiled, then this one is just timed
+    if not __is_profiling_requested() or not _profile_lock.acquire(blocking=False):
+        return
+
+    g.profiler = Profile()
+    g.sampler = StackSampler(get_ident())
+
+    g.sampler.start()
+    g.profiler.enable()
+
+
+def __stop_profiler():
+    # return the profiler and the sampler of the current request, if it is profiled
+    profiler = g.pop('profiler', None)
+
+    if profiler is None:
+        return None, None
+
+    profiler.disable()
+
+    sampler = g.pop('sampler')
+    sampler.stop()
+
+    _profile_lock.release()
+
+    return profiler, sampler
+
+
+def stop_profiling(response):
+    # it is registered as an `after_request` function of the server
+    if 'profiling_start' not in g:
+        return response
+
+    duration = perf_counter() - g.pop('profiling_start')
+    profiler, sampler = __stop_profiler()
+
+    callback_request = __get_callback_request()
+    callback_request.update({
+        'date': datetime.now().isoformat(),
+        'duration': duration,
+        'status': response.status_code,
+        'profile': None
+    })
+
+    if profiler is not None:
+        callback_request['profile'] = __add_profile(profiler, sampler, callback_request)
+
+    __add_slow_request(callback_request)
+
+    return response
+
+
+def release_profiler(exception=None):
+    # it is registered as a `teardown_request` function of the server, if the request has failed before
+    # `stop_profiling`, then the profiler is stopped here
+    __stop_profiler()
+
+
+##################################################
+# profiles and slowest requests
+##################################################
+
+def __add_profile(profiler, sampler, callback_request):
+    stats = Stats(profiler)
+
+    text = StringIO()
+    Stats(profiler, stream=text).sort_stats('cumulative').print_stats(50)
+
+    profile_id = next(_profile_ids)
+
+    profile = dict(
+        callback_request,
+        id=profile_id,
+        samples=sum(sampler.stacks.values()),
+        # the same content of a file written by `Stats.dump_stats`, it can be read by `pstats` and by other tools
+        pstats=marshal_dumps(stats.stats),
+        text=text.getvalue(),
+        collapsed=sampler.get_collapsed_stacks()
+    )
+
+    with _profiles_lock:
+        _profiles[profile_id] = profile
+
+        while len(_profiles) > max_profiles:
+            _profiles.popitem(last=False)
+
+    logging.info('__add_profile() - id: %s - callback: %s - duration: %.3f s\n',
+                 profile_id, callback_request['callback'], callback_request['duration'])
+
+    return profile_id
+
+
+def __add_slow_request(callback_request):
+    if PROFILING_SLOWEST_REQUESTS <= 0:
+        return
+
+    item = (callback_request['duration'], next(_order), callback_request)
+
+    with _slowest_lock:
+        if len(_slowest_requests) < PROFILING_SLOWEST_REQUESTS:
+            heappush(_slowest_requests, item)
+        elif item[0] > _slowest_requests[0][0]:
+            heappushpop(_slowest_requests, item)
+
+
+def get_profiles():
+    # the profiles without their content, the most recent ones first
+    with _profiles_lock:
+        profiles = list(_profiles.values())
+
+    return [
+        {key: value for key, value in profile.items() if key not in ('pstats', 'text', 'collapsed')}
+        for profile in reversed(profiles)
+    ]
+
+
+def get_profile(profile_id, kind):
+    # return the content of a profile, `kind` is `pstats`, `text` or `collapsed`, or `None` if it does not exist
+    with _profiles_lock:
+        profile = _profiles.get(profile_id)
+
+    return None if profile is None else profile.get(kind)
+
+
+def get_slowest_requests():
+    # the slowest requests first
+    with _slowest_lock:
+        return [item[2] for item in sorted(_slowest_requests, key=lambda item: item[0], reverse=True)]
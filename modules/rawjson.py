@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""Values that are already serialized as JSON (e.g. the cached figures), they are inserted as they are in the response.
+
+Dash serializes the outputs of a callback with `PlotlyJSONEncoder`, that encodes, decodes and encodes the whole
+response again. A callback may return `RawJSON(text)` instead of a value, then the encoder just writes a placeholder
+and `insert_raw_json` replaces it by `text` after the request, without encoding the value again.
+"""
+
+from json import loads
+from uuid import uuid4
+
+from flask import g, has_request_context
+
+
+class RawJSON():
+    """A value serialized as JSON, e.g. `RawJSON(dumps(figure, cls=PlotlyJSONEncoder))`."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __len__(self):
+        return len(self.text)
+
+    def to_plotly_json(self):
+        # it is called by `PlotlyJSONEncoder`, outside a request (e.g. a script), the value is decoded
+        if not has_request_context():
+            return loads(self.text)
+
+        placeholder = 'raw-json:{}'.format(uuid4().hex)
+
+        if 'raw_json' not in g:
+            g.raw_json = {}
+
+        g.raw_json[placeholder] = self.text
+
+        return placeholder
+
+
+def insert_raw_json(response):
+    # it is registered as an `after_request` function of the server, it must run before the other ones
+    # (i.e. it must be registered after them, see `app.py`), then they see the final response
+    raw_json = g.pop('raw_json', None)
+
+    if not raw_json or response.status_code != 200:
+        return response
+
+    # the placeholders can not be found in a compressed response (i.e. `Compress` has run before this function),
+    # then the request fails instead of sending them as the values
+    if 'Content-Encoding' in response.headers:
+        raise RuntimeError('insert_raw_json() - the response is already encoded as `{}`, the values can not be '
+                           'inserted'.format(response.headers['Content-Encoding']))
+
+    data = response.get_data()
+
+    for placeholder, text in raw_json.items():
+        data = data.replace('"{}"'.format(placeholder).encode(), text.encode(), 1)
+
+    response.set_data(data)
+
+    return response
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+"""Refresh the data of the apps in background"""
+
+from fcntl import LOCK_EX, LOCK_NB, flock
+from os import makedirs, register_at_fork
+from os.path import join
+from threading import Event, Lock, Thread
+
+from modules.environment import IS_TO_USE_SHARED_DATA, REFRESH_INTERVAL, SNAPSHOT_DIRECTORY
+from modules.logging import logging
+from modules.snapshot import is_snapshot_changed
+
+
+class Refresher(Thread):
+
+    def __init__(self, name, store, refresh, interval=REFRESH_INTERVAL):
+        super().__init__(name='refresher-{}'.format(name), daemon=True)
+
+        self.store = store
+        # `refresh(data)` returns the new version of `data` or `None` if there is nothing new
+        self.refresh = refresh
+        self.interval = interval
+
+        self.__stop_event = Event()
+
+    def run(self):
+        logging.info('Refresher.run() - %s - interval: %ss\n', self.name, self.interval)
+
+        # wait for the interval, unless someone stops the refresher
+        while not self.__stop_event.wait(self.interval):
+            self.refresh_now()
+
+    def refresh_now(self):
+        # if the data is shared, then just one process refreshes it, the other ones follow its snapshots
+        if IS_TO_USE_SHARED_DATA and not is_leader():
+            return
+
+        try:
+            data = self.refresh(self.store.data)
+
+        # the refresher must keep running even if the database is unavailable for a while
+        except Exception as error:
+            logging.error('Refresher.refresh_now() - %s - error: %s\n', self.name, error)
+            return
+
+        if data is None:
+            logging.info('Refresher.refresh_now() - %s - there is no new data\n', self.name)
+            return
+
+        self.store.publish(data)
+
+    def stop(self):
+        self.__stop_event.set()
+
+
+# registered refreshers: name -> (store, refresh)
+_refreshers = {}
+# running threads, they are created again on each start (e.g. in a forked worker)
+_threads = []
+_lock = Lock()
+
+
+# registered followers: name -> (store, read), `read()` returns the data of the last snapshot or `None`
+_followers = {}
+# just one thread of the process attaches to a new snapshot
+_follow_lock = Lock()
+
+# the file whose lock is held by the process that refreshes the shared data (i.e. the leader)
+_leader_file = None
+
+
+def register_refresher(name, store, refresh):
+    with _lock:
+        _refreshers[name] = (store, refresh)
+
+
+def register_follower(name, store, read):
+    # `name` is the name of the snapshot that `read()` reads
+    with _lock:
+        _followers[name] = (store, read)
+
+
+def start_refreshers(interval=REFRESH_INTERVAL):
+    # if the interval is not a positive number, then the data is never refreshed
+    if interval <= 0:
+        logging.info('start_refreshers() - the refreshers are disabled\n')
+        return
+
+    with _lock:
+        if _threads:
+            return
+
+        for name, (store, refresh) in _refreshers.items():
+            thread = Refresher(name, store, refresh, interval=interval)
+            thread.start()
+
+            _threads.append(thread)
+
+
+def stop_refreshers():
+    with _lock:
+        for thread in _threads:
+            thread.stop()
+
+        _threads.clear()
+
+
+##################################################
+# shared data
+##################################################
+
+def is_leader():
+    # the first process that locks the file refreshes the data while it is running,
+    # if it stops, then the lock is released and another process takes its place on its next refresh
+    global _leader_file
+
+    if _leader_file is not None:
+        return True
+
+    makedirs(SNAPSHOT_DIRECTORY, exist_ok=True)
+
+    file = open(join(SNAPSHOT_DIRECTORY, 'refresh.lock'), 'w')
+
+    try:
+        flock(file, LOCK_EX | LOCK_NB)
+    except OSError:
+        file.close()
+        return False
+
+    _leader_file = file
+
+    logging.info('is_leader() - this process refreshes the shared data now\n')
+
+    return True
+
+
+def follow_snapshots():
+    # it is called before each request, if a new snapshot was written by the leader, then the store
+    # switches to it, the memory-mapped files are shared by the processes instead of copied
+    for name, (store, read) in list(_followers.items()):
+        if not is_snapshot_changed(name):
+            continue
+
+        # if another thread is already attaching to the snapshot, then the request uses the current data
+        if not _follow_lock.acquire(blocking=False):
+            return
+
+        try:
+            if is_snapshot_changed(name):
+                data = read()
+
+                if data is not None:
+                    logging.info('follow_snapshots() - %s - a new snapshot was attached\n', name)
+                    store.publish(data)
+
+        # the request must be answered with the current data, even if the new snapshot can not be attached
+        except Exception as error:
+            logging.error('follow_snapshots() - %s - error: %s\n', name, error)
+
+        finally:
+            _follow_lock.release()
+
+
+def __forget_threads():
+    # the threads of the parent process do not exist in a forked process
+    global _lock, _follow_lock, _leader_file
+
+    _threads.clear()
+    _lock = Lock()
+    _follow_lock = Lock()
+
+    # the lock belongs to the parent process, closing the inherited file does not release it
+    if _leader_file is not None:
+        _leader_file.close()
+        _leader_file = None
+
+
+register_at_fork(after_in_child=__forget_threads)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from threading import Lock
+
+from dash.exceptions import PreventUpdate
+
+from modules.logging import logging
+
+
+class RequestSequencer():
+    """Number the requests of each session (i.e. a page opened by a browser) by callback.
+
+    When the inputs change rapidly (e.g. the user types a limit), the browser sends a new request
+    before the previous one has finished, and just the result of the last one is shown. Then a callback
+    starts its request with `start` and it calls `check` between its steps: if a newer request of the same
+    session and callback has started, then the old one is abandoned by `PreventUpdate`, instead of being
+    computed until the end.
+
+    The sessions are forgotten (i.e. their requests are not abandoned anymore) when there are more
+    than `maxsize` pairs of session and callback.
+    """
+
+    def __init__(self, name, maxsize=4096):
+        self.name = name
+        self.maxsize = maxsize
+
+        self.abandoned = 0
+
+        self.__lock = Lock()
+        # (session, callback) -> number of the last request, the most recently used ones are at the end
+        self.__numbers = OrderedDict()
+
+    def start(self, session_id, callback):
+        # return the token of a new request, or `None` if the session is not known (e.g. an old page)
+        if not session_id:
+            return None
+
+        key = (session_id, callback)
+
+        with self.__lock:
+            number = self.__numbers.pop(key, 0) + 1
+            self.__numbers[key] = number
+
+            while len(self.__numbers) > self.maxsize:
+                self.__numbers.popitem(last=False)
+
+        return key, number
+
+    def is_superseded(self, token):
+        if token is None:
+            return False
+
+        key, number = token
+
+        with self.__lock:
+            return self.__numbers.get(key, number) != number
+
+    def check(self, token):
+        # abandon the request if a newer one of the same session and callback has started
+        if not self.is_superseded(token):
+            return
+
+        with self.__lock:
+            self.abandoned += 1
+
+        logging.info('RequestSequencer.check() - sequencer: %s - callback: %s - the request %s is superseded\n',
+                     self.name, token[0][1], token[1])
+
+        raise PreventUpdate
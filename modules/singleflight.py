@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from threading import Event, Lock
+from types import SimpleNamespace
+
+from modules.logging import logging
+from modules.metrics import increment
+
+
+class SingleFlight():
+    """Coalesce the concurrent calls with the same key, then just one of them computes the result.
+
+    When many users open the same page at once (e.g. after a deploy), they request the same results
+    (e.g. the figures of the default date range) at the same time. The first call of a key computes it
+    and the other ones wait for it and share its result, instead of computing it again in parallel.
+
+    If the first call fails (e.g. it is abandoned because its user has changed the parameters),
+    then the waiting calls try again, instead of failing with it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+        # number of calls that have waited for another call
+        self.shared = 0
+
+        self.__lock = Lock()
+        # key -> call in progress
+        self.__calls = {}
+
+    def do(self, key, function):
+        # return the result of `function()`, that is called once for the concurrent calls with the same `key`
+        while True:
+            with self.__lock:
+                call = self.__calls.get(key)
+                is_first_call = call is None
+
+                if is_first_call:
+                    call = self.__calls[key] = SimpleNamespace(done=Event(), has_succeeded=False, result=None)
+                else:
+                    self.shared += 1
+
+            if is_first_call:
+                try:
+                    call.result = function()
+                    call.has_succeeded = True
+
+                    return call.result
+
+                finally:
+                    with self.__lock:
+                        del self.__calls[key]
+
+                    call.done.set()
+
+            increment('catalog_dash_singleflight_shared_total', singleflight=self.name)
+            logging.info('SingleFlight.do() - singleflight: %s - waiting for: %s\n', self.name, key)
+
+            call.done.wait()
+
+            if call.has_succeeded:
+                return call.result
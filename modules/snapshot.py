@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+"""Keep a copy of the data of the apps on disk in order to start the application faster.
+
+Each dataframe column is saved as a typed NumPy file (`.npy`), then it can be read again
+as a memory-mapped array without parsing any text. The snapshot is described by a JSON file
+that is replaced at once, so a reader never sees a snapshot that is being written.
+
+The JSON file is also the pointer to the last version of the data: if several processes share the directory
+(see `IS_TO_USE_SHARED_DATA`), then one of them writes the new versions and the other ones attach to them
+(i.e. the memory-mapped files are shared by the processes, instead of each one keeping a copy).
+"""
+
+from datetime import date, datetime
+from json import dump, load
+from os import fstat, getpid, listdir, makedirs, replace, stat
+from os.path import exists, join
+from shutil import rmtree
+from uuid import uuid4
+
+from numpy import array, generic, load as np_load, memmap, save as np_save, shares_memory
+from pandas import Categorical, DataFrame, Index, RangeIndex, __version__ as pandas_version, factorize
+from pandas.api.types import is_categorical_dtype
+
+from modules.environment import IS_TO_USE_SNAPSHOT, SNAPSHOT_DIRECTORY, \
+                                MYSQL_DB_HOST, MYSQL_DB_PORT, MYSQL_DB_DATABASE
+from modules.exception import CatalogDashException
+from modules.logging import logging
+
+
+# change it when the structure of the data changes, then the old snapshots are not used anymore
+SNAPSHOT_VERSION = 5
+
+# the last data that was read or written by each snapshot, it avoids writing the same data again
+_snapshots = {}
+# the metadata file that was read or written by each snapshot, a new file means that there is a new version
+_pointers = {}
+
+
+##################################################
+# source keys
+##################################################
+
+def get_database_source_key(table):
+    return 'mysql://{}:{}/{}/{}'.format(MYSQL_DB_HOST, MYSQL_DB_PORT, MYSQL_DB_DATABASE, table)
+
+
+def get_file_source_key(path):
+    # if the file changes, then the key changes too
+    file_stat = stat(path)
+    return 'file://{}?mtime={}&size={}'.format(path, file_stat.st_mtime_ns, file_stat.st_size)
+
+
+##################################################
+# encoding
+##################################################
+
+def __encode_scalar(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    # e.g. numpy.int64
+    if isinstance(value, generic):
+        return value.item()
+
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+
+def __decode_scalar(value):
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__date__' in value:
+        return date.fromisoformat(value['__date__'])
+
+    return value
+
+
+def __write_column(series, path):
+    # write the column as `.npy` files and return how to read it again
+    if is_categorical_dtype(series.dtype):
+        categories = series.cat.categories.values
+
+        # the strings are saved as a NumPy string array, because an array of objects can not be memory-mapped
+        if categories.dtype == object:
+            categories = array(categories, dtype=str)
+
+        np_save(path + '.npy', series.cat.codes.values)
+        np_save(path + '.categories.npy', categories)
+        return 'category'
+
+    if series.dtype != object:
+        # numbers, booleans and datetime64 are saved as they are
+        np_save(path + '.npy', series.values)
+        return 'array'
+
+    first_value = series.dropna().iloc[0] if series.notna().any() else ''
+
+    if isinstance(first_value, date) and not isinstance(first_value, datetime):
+        # the dates are saved as `datetime64[ns]`, then they are read as the memory-mapped array itself
+        np_save(path + '.npy', array(series.values, dtype='datetime64[ns]'))
+        return 'date'
+
+    if isinstance(first_value, str):
+        # the strings are saved once and each row keeps just the code of its string
+        codes, uniques = factorize(series)
+        np_save(path + '.npy', codes.astype('int32'))
+        np_save(path + '.categories.npy', array(uniques, dtype=str))
+        return 'string'
+
+    raise CatalogDashException(
+        'Column `{}` of type `{}` can not be saved in a snapshot.'.format(series.name, type(first_value).__name__)
+    )
+
+
+def __get_pointer(file_stat):
+    # the metadata file is replaced (i.e. it is a new file) on each new version
+    return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size
+
+
+def __is_shared(df, columns):
+    # `True` if the memory-mapped columns of `df` are still the arrays of the files
+    return all(
+        shares_memory(df[column].values, values) for column, values in columns.items() if isinstance(values, memmap)
+    )
+
+
+def __get_df_from_columns(columns):
+    # create a dataframe whose columns are the memory-mapped arrays themselves, without copying them;
+    # `DataFrame(dict)` copies the columns with the same type to a single block, and even with `copy=False`
+    # (pandas >= 1.3) the first filter of the dataframe joins its blocks in place, i.e. it copies them,
+    # then the blocks are created here and marked as already joined; it uses the internals of pandas,
+    # then it is checked on each read (see the pin of pandas in `requirements.txt`)
+    try:
+        from pandas.core.internals import BlockManager, make_block
+
+        length = len(next(iter(columns.values()))) if columns else 0
+
+        blocks = [
+            # a NumPy column is a block with one row, an extension array (e.g. `Categorical`) is a block itself
+            make_block(
+                values if isinstance(values, Categorical) else values.reshape(1, -1),
+                placement=slice(i, i + 1), ndim=2
+            )
+            for i, values in enumerate(columns.values())
+        ]
+
+        manager = BlockManager(blocks, [Index(list(columns)), RangeIndex(length)])
+        # do not join the blocks later, it would copy the columns
+        manager._is_consolidated = True
+        manager._known_consolidated = True
+
+        df = DataFrame(manager)
+
+    # if the internals of pandas change, then the columns are copied
+    except Exception as error:
+        logging.warning(
+            '__get_df_from_columns() - the columns are copied, then the processes do not share them '
+            '(pandas %s): %s', pandas_version, error
+        )
+
+        return DataFrame(columns, columns=list(columns))
+
+    if not __is_shared(df, columns):
+        logging.warning(
+            '__get_df_from_columns() - the columns were copied by pandas %s, then the processes do not share them',
+            pandas_version
+        )
+
+    return df
+
+
+def __read_column(kind, path):
+    # the arrays are memory-mapped, then just the used pages are read from disk
+    values = np_load(path + '.npy', mmap_mode='r')
+
+    if kind == 'array':
+        return values
+
+    if kind == 'date':
+        # the dates are kept as `datetime64[ns]`, instead of `datetime.date` objects, that would copy the column
+        return values
+
+    categories = np_load(path + '.categories.npy')
+
+    if kind == 'category':
+        return Categorical.from_codes(values, categories)
+
+    if kind == 'string':
+        values_as_str = categories.astype(object)[values]
+        # `-1` is the code of a missing value
+        values_as_str[values < 0] = None
+        return values_as_str
+
+    raise CatalogDashException('Invalid column kind `{}` in a snapshot.'.format(kind))
+
+
+##################################################
+# snapshot
+##################################################
+
+def write_snapshot(name, key, data, exclude=(), directory=SNAPSHOT_DIRECTORY):
+    # `data` is a dict with dataframes and JSON serializable values (e.g. numbers and dates)
+    if not IS_TO_USE_SNAPSHOT or _snapshots.get(name) is data:
+        return
+
+    logging.info('write_snapshot() - name: %s - key: %s', name, key)
+
+    makedirs(directory, exist_ok=True)
+
+    # each snapshot is written in a new directory, then the old one is still valid during the writing
+    snapshot_directory = '{}-{}'.format(name, uuid4().hex)
+    makedirs(join(directory, snapshot_directory))
+
+    metadata = {
+        'version': SNAPSHOT_VERSION,
+        'key': key,
+        'directory': snapshot_directory,
+        'frames': {},
+        'values': {}
+    }
+
+    for item, value in data.items():
+        if item in exclude:
+            continue
+
+        if isinstance(value, DataFrame):
+            metadata['frames'][item] = [
+                [column, __write_column(value[column], join(directory, snapshot_directory, '{}.{}'.format(item, i)))]
+                for i, column in enumerate(value.columns)
+            ]
+        else:
+            metadata['values'][item] = value
+
+    # replace the JSON file at once, then the readers see the old snapshot or the new one
+    metadata_file = join(directory, '{}.json'.format(name))
+    temporary_file = '{}.{}.tmp'.format(metadata_file, getpid())
+
+    with open(temporary_file, 'w') as file:
+        dump(metadata, file, default=__encode_scalar)
+
+    replace(temporary_file, metadata_file)
+
+    _snapshots[name] = data
+    _pointers[name] = __get_pointer(stat(metadata_file))
+
+    __remove_old_snapshots(name, snapshot_directory, directory)
+
+    logging.info('write_snapshot() - name: %s - directory: %s\n', name, snapshot_directory)
+
+
+def __remove_old_snapshots(name, current_directory, directory):
+    for item in listdir(directory):
+        if item.startswith(name + '-') and item != current_directory:
+            rmtree(join(directory, item), ignore_errors=True)
+
+
+def read_snapshot(name, key, directory=SNAPSHOT_DIRECTORY):
+    # return the data of the snapshot, or `None` if there is not a valid snapshot
+    if not IS_TO_USE_SNAPSHOT:
+        return None
+
+    metadata_file = join(directory, '{}.json'.format(name))
+
+    if not exists(metadata_file):
+        logging.info('read_snapshot() - name: %s - there is no snapshot\n', name)
+        return None
+
+    try:
+        with open(metadata_file) as file:
+            # this version is not read again, even if it is not valid
+            _pointers[name] = __get_pointer(fstat(file.fileno()))
+
+            metadata = load(file, object_hook=__decode_scalar)
+
+        if metadata['version'] != SNAPSHOT_VERSION or metadata['key'] != key:
+            logging.info('read_snapshot() - name: %s - the snapshot is not valid anymore\n', name)
+            return None
+
+        data = dict(metadata['values'])
+
+        for item, columns in metadata['frames'].items():
+            data[item] = __get_df_from_columns({
+                column: __read_column(kind, join(directory, metadata['directory'], '{}.{}'.format(item, i)))
+                for i, (column, kind) in enumerate(columns)
+            })
+
+    # an invalid snapshot must not avoid the application to start, the data is loaded from the source
+    except (OSError, ValueError, KeyError, CatalogDashException) as error:
+        logging.error('read_snapshot() - name: %s - error: %s\n', name, error)
+        return None
+
+    _snapshots[name] = data
+
+    logging.info('read_snapshot() - name: %s - directory: %s\n', name, metadata['directory'])
+
+    return data
+
+
+def is_snapshot_changed(name, directory=SNAPSHOT_DIRECTORY):
+    # return `True` if another process has written a new version of the snapshot since this process
+    # has read or written it
+    try:
+        return __get_pointer(stat(join(directory, '{}.json'.format(name)))) != _pointers.get(name)
+    except OSError:
+        return False
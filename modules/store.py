@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from threading import RLock
+
+from pandas import DataFrame
+
+from modules.logging import logging
+
+
+class DataStore():
+    """Keep the current version of the data (e.g. dataframes) used by an app.
+
+    The data is a dict that is never changed after being published, a new version
+    replaces the whole dict. Then a callback should get `store.data` once and use it
+    until the end, in order to see a consistent version of the data.
+    """
+
+    def __init__(self, name, data=None):
+        self.name = name
+
+        self.__lock = RLock()
+        self.__listeners = []
+        # the version and the data are kept together to be replaced at once
+        self.__state = (0, {})
+
+        if data is not None:
+            self.publish(data)
+
+    @property
+    def version(self):
+        return self.__state[0]
+
+    @property
+    def data(self):
+        return self.__state[1]
+
+    @property
+    def state(self):
+        # (version, data)
+        return self.__state
+
+    def add_listener(self, listener):
+        # `listener(store)` is called after a new version of the data is published
+        with self.__lock:
+            self.__listeners.append(listener)
+
+    def publish(self, data):
+        with self.__lock:
+            self.__state = (self.__state[0] + 1, data)
+            listeners = list(self.__listeners)
+
+        logging.info('DataStore.publish() - store: %s - version: %s\n', self.name, self.version)
+
+        self.__log_memory_usage(data)
+
+        for listener in listeners:
+            try:
+                listener(self)
+            except Exception as error:
+                # a listener must not avoid the publication of the data
+                logging.error('DataStore.publish() - store: %s - listener error: %s\n', self.name, error)
+
+    def __log_memory_usage(self, data):
+        # memory used by each dataframe, including the Python objects (e.g. strings)
+        for key, value in data.items():
+            if isinstance(value, DataFrame):
+                logging.info(
+                    'DataStore.publish() - store: %s - %s: %s rows - %.2f MB',
+                    self.name, key, len(value), value.memory_usage(deep=True).sum() / 1024 ** 2
+                )
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+"""Paging, sorting and filtering of a DataTable on the server.
+
+The DataTables use `page_action`, `sort_action` and `filter_action` equal to `custom`, then the browser
+sends the current page, the `sort_by` and the `filter_query` and it receives just the rows of the visible page.
+The filter query of the DataTable (e.g. `{number} > 10 && {name} contains abc`) is translated to vectorized
+operations over the dataframe.
+"""
+
+from math import ceil
+from re import compile as re_compile
+
+from numpy import asarray, ones, zeros
+from pandas import Series, factorize, to_numeric
+from pandas.api.types import is_categorical_dtype, is_numeric_dtype
+
+from modules.logging import logging
+from modules.metrics import add_rows_scanned
+
+
+# the word operators are equivalent to the symbols, e.g. `{number} ge 10` is `{number} >= 10`
+operators = {
+    '=': 'eq', 'eq': 'eq',
+    '!=': 'ne', 'ne': 'ne',
+    '<': 'lt', 'lt': 'lt',
+    '<=': 'le', 'le': 'le',
+    '>': 'gt', 'gt': 'gt',
+    '>=': 'ge', 'ge': 'ge',
+    'contains': 'contains',
+    'datestartswith': 'datestartswith'
+}
+
+# e.g. `{number} >= 10`, `{name} icontains "abc"` or `{name} is blank`
+filter_expression = re_compile(r'^\s*\{(?P<column>[^}]+)\}\s*(?P<operator>is not blank|is blank|[^\s"\'`]+)\s*(?P<value>.*?)\s*$')
+
+
+##################################################
+# filter
+##################################################
+
+def __parse_filter_query(filter_query):
+    # return a list of (column, operator, value, is case sensitive), the invalid expressions are ignored
+    expressions = []
+
+    for part in (filter_query or '').split(' && '):
+        if not part.strip():
+            continue
+
+        match = filter_expression.match(part)
+
+        if match is None:
+            logging.info('__parse_filter_query() - invalid expression: %s', part)
+            continue
+
+        column, operator, value = match.group('column', 'operator', 'value')
+        operator = operator.lower()
+
+        # the `i` and `s` prefixes choose a case insensitive or sensitive comparison (e.g. `icontains`)
+        is_case_sensitive = True
+
+        if operator not in operators and operator[1:] in operators and operator[0] in ('i', 's'):
+            is_case_sensitive = operator[0] == 's'
+            operator = operator[1:]
+
+        if operator not in operators and operator not in ('is blank', 'is not blank'):
+            logging.info('__parse_filter_query() - invalid operator: %s', part)
+            continue
+
+        # remove the quotes of a string value, e.g. `"abc"`
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+            value = value[1:-1]
+
+        expressions.append((column, operators.get(operator, operator), value, is_case_sensitive))
+
+    return expressions
+
+
+def __evaluate(values, operator, value, is_case_sensitive=True):
+    # return a boolean array with the values (a series) that satisfy the expression
+    if operator in ('is blank', 'is not blank'):
+        is_blank = values.isna().values | (values.astype(str) == '').values
+        return is_blank if operator == 'is blank' else ~is_blank
+
+    if operator in ('contains', 'datestartswith') or not is_numeric_dtype(values.dtype):
+        # the comparison is done on the text as it is displayed on the table
+        text = values.astype(str)
+
+        if not is_case_sensitive:
+            text, value = text.str.lower(), value.lower()
+
+        if operator == 'contains':
+            return text.str.contains(value, regex=False).values
+        if operator == 'datestartswith':
+            return text.str.startswith(value).values
+    else:
+        # a number column is just compared with a number, as the native filter
+        text = values
+        value = to_numeric(value, errors='coerce')
+
+        if value != value:
+            return zeros(len(values), dtype=bool)
+
+    return asarray(getattr(text, '__{}__'.format(operator))(value), dtype=bool)
+
+
+def __get_mask(series, operator, value, is_case_sensitive=True, formatter=None):
+    if formatter is None and not is_categorical_dtype(series.dtype):
+        return __evaluate(series, operator, value, is_case_sensitive)
+
+    # a column with few different values (e.g. categories and dates) is evaluated once by value,
+    # then each row takes the result of its value
+    if formatter is None:
+        codes, uniques = series.cat.codes.values, Series(series.cat.categories)
+    else:
+        codes, uniques = factorize(series)
+        # the value is compared with the text that is displayed on the table (e.g. '2020-01' instead of 24240)
+        uniques = formatter(Series(uniques))
+
+    result = __evaluate(uniques.reset_index(drop=True), operator, value, is_case_sensitive)
+
+    # `-1` is the code of a missing value
+    is_missing_accepted = operator == 'is blank' or (operator == 'ne' and not is_numeric_dtype(uniques.dtype))
+
+    mask = result[codes] if len(result) else zeros(len(codes), dtype=bool)
+    mask[codes < 0] = is_missing_accepted
+
+    return mask
+
+
+def filter_df_by_query(df, filter_query, formatters={}):
+    """Return the rows of `df` that satisfy the `filter_query` of a DataTable.
+
+    `formatters` is a dict of column -> function that receives a series and returns it as it is displayed
+    on the table, then the filter compares the displayed text, e.g. a date as 'YYYY-MM-DD'.
+    """
+    mask = ones(len(df), dtype=bool)
+
+    for column, operator, value, is_case_sensitive in __parse_filter_query(filter_query):
+        # a column that does not exist does not filter anything, as the native filter
+        if column not in df.columns:
+            continue
+
+        mask &= __get_mask(df[column], operator, value, is_case_sensitive, formatters.get(column))
+
+    return df if mask.all() else df[mask]
+
+
+##################################################
+# sort and page
+##################################################
+
+def sort_df_by(df, sort_by):
+    # `sort_by` is a list of dicts with `column_id` and `direction` (i.e. 'asc' or 'desc')
+    sort_by = [item for item in (sort_by or []) if item['column_id'] in df.columns]
+
+    if not sort_by or df.empty:
+        return df
+
+    return df.sort_values(
+        [item['column_id'] for item in sort_by],
+        ascending=[item['direction'] == 'asc' for item in sort_by],
+        # the rows with the same values keep their original order
+        kind='mergesort'
+    )
+
+
+def get_page_of_df(df, page_current=0, page_size=50, sort_by=None, filter_query='', formatters={}):
+    """Return the records of the current page of the table and the number of pages.
+
+    The rows are filtered by `filter_query`, sorted by `sort_by` and then just the rows
+    of the page are formatted (see `filter_df_by_query`) and converted to records.
+    """
+    add_rows_scanned(len(df))
+
+    df = sort_df_by(filter_df_by_query(df, filter_query, formatters), sort_by)
+
+    page_current = page_current or 0
+    page_size = page_size or len(df) or 1
+
+    page_count = max(ceil(len(df) / page_size), 1)
+
+    page = df.iloc[page_current * page_size:(page_current + 1) * page_size]
+
+    # just the rows that are sent to the browser are formatted
+    page = page.assign(**{
+        column: formatter(page[column]).values for column, formatter in formatters.items() if column in page.columns
+    })
+
+    logging.info('get_page_of_df() - rows: %s - page_current: %s - page_count: %s', len(df), page_current, page_count)
+
+    return page.to_dict('records'), page_count
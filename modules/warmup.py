@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""Precompute in background the results that most users request (e.g. the figures of the default date range)
+
+After a new version of the data is published (i.e. on the start and after each refresh), the tasks of its app
+are computed by a thread pool, then their results are already cached when the first users open the pages.
+Each task calls the same functions as the callbacks, with the same parameters, then it fills the same caches.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from os import register_at_fork
+from threading import Lock
+from time import perf_counter
+
+from modules.environment import IS_TO_USE_WARMUP, WARMUP_WORKERS
+from modules.logging import logging
+from modules.metrics import increment
+
+
+# registered warm-ups: name -> (store, get_tasks), `get_tasks(store)` returns a list of (description, function)
+_warmups = {}
+# progress of the last warm-up of each app: name -> dict
+_progress = {}
+# the warm-ups run just after `start_warmups`, before it the data is loaded and the caches are empty anyway
+_is_started = False
+# the threads are created on the first warm-up of the process (e.g. in a forked worker)
+_executor = None
+_lock = Lock()
+
+
+def register_warmup(name, store, get_tasks):
+    with _lock:
+        _warmups[name] = (store, get_tasks)
+
+    # each new version of the data is warmed up
+    store.add_listener(lambda store: warm_up(name))
+
+
+def __get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(WARMUP_WORKERS, 1), thread_name_prefix='warmup')
+
+    return _executor
+
+
+def __run_task(name, store, progress, start, description, function):
+    # if a newer version of the data has been published, then the results of this one are not requested anymore
+    if store.version != progress['version']:
+        status = 'skipped'
+    else:
+        try:
+            function()
+            status = 'done'
+
+        # a task must not stop the other ones, the callback computes the result again when it is requested
+        except Exception as error:
+            logging.error('__run_task() - %s - %s - error: %s\n', name, description, error)
+            status = 'failed'
+
+    with _lock:
+        progress[status] += 1
+        finished = progress['done'] + progress['failed'] + progress['skipped']
+
+        if finished == progress['tasks']:
+            progress['duration'] = perf_counter() - start
+
+    increment('catalog_dash_warmup_tasks_total', store=name, status=status)
+
+    logging.info('__run_task() - %s - version: %s - %s: %s - %s/%s tasks\n',
+                 name, progress['version'], description, status, finished, progress['tasks'])
+
+
+def warm_up(name):
+    # compute the tasks of the current version of the data of `name` in background, it returns their futures
+    if not _is_started:
+        return []
+
+    store, get_tasks = _warmups[name]
+
+    try:
+        tasks = get_tasks(store)
+
+    except Exception as error:
+        logging.error('warm_up() - %s - error: %s\n', name, error)
+        return []
+
+    progress = {
+        'version': store.version,
+        'tasks': len(tasks),
+        'done': 0,
+        'failed': 0,
+        'skipped': 0,
+        'date': datetime.now().isoformat(),
+        # number of seconds until the last task has finished
+        'duration': None if tasks else 0.0
+    }
+
+    with _lock:
+        _progress[name] = progress
+        executor = __get_executor()
+
+    logging.info('warm_up() - %s - version: %s - tasks: %s\n', name, progress['version'], len(tasks))
+
+    start = perf_counter()
+
+    return [
+        executor.submit(__run_task, name, store, progress, start, description, function)
+        for description, function in tasks
+    ]
+
+
+def start_warmups(is_to_wait=False):
+    # warm up the current data of the registered apps, and their new versions from now on;
+    # if `is_to_wait` is True, then it returns just when the results are cached (e.g. before forking the workers)
+    global _is_started
+
+    if not IS_TO_USE_WARMUP:
+        logging.info('start_warmups() - the warm-ups are disabled\n')
+        return
+
+    with _lock:
+        if _is_started:
+            return
+
+        _is_started = True
+        names = list(_warmups)
+
+    futures = [future for name in names for future in warm_up(name)]
+
+    if is_to_wait:
+        wait(futures)
+
+
+def get_warmup_progress():
+    # the progress of the last warm-up of each app, e.g. {'download': {'version': 1, 'tasks': 8, 'done': 8, ...}}
+    with _lock:
+        return {name: dict(progress) for name, progress in _progress.items()}
+
+
+def __forget_threads():
+    # the threads of the parent process do not exist in a forked process, but its cached results do
+    global _executor, _lock
+
+    _executor = None
+    _lock = Lock()
+
+
+register_at_fork(after_in_child=__forget_threads)
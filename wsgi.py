@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+"""WSGI entry point of the application, it is used by a production server (e.g. gunicorn).
+
+With `preload_app` (see `gunicorn.conf.py`), this module is imported once by the master process,
+then the data is loaded and aggregated before the workers are forked and they share its memory pages.
+"""
+
+from main import app
+
+
+# the Flask server that receives the requests
+application = app.server